@@ -0,0 +1,170 @@
+import os
+import random
+import sys
+import tempfile
+import time
+
+import matching
+
+"""
+Benchmarks for matching.py.
+
+Usage: python benchmark.py [n ...]
+
+Each n builds two instances with n residents and n hospitals, one with
+random preference lists and one where every resident ranks the hospitals in
+the same order (which forces O(n^2) proposals), writes them in the input
+format of matching.py, then times parsing and the matching itself.
+Parsing is timed three ways: read_preferences (names as strings),
+load_instance (names interned to ids) and load_binary_instance (a mapped
+copy written by save_binary_instance). The matching found on the ids is
+then checked with verify_stable. The original list based loop is kept below as legacy_gale_shapley
+and is timed on the same instance. Instances take O(n^2) memory, so sizes
+near 20000 need several gigabytes.
+
+Each n also times rematch against a full gale_shapley run after
+REMATCH_CHANGES residents reshuffle their lists and one hospital withdraws.
+
+Afterwards hospital_residents is timed on a many-to-one instance of
+MANY_RESIDENTS residents, each ranking LIST_LENGTH of MANY_HOSPITALS
+hospitals with MANY_SLOTS slots apiece.
+"""
+
+MANY_RESIDENTS = 100000
+MANY_HOSPITALS = 5000
+MANY_SLOTS = 16
+LIST_LENGTH = 20
+REMATCH_CHANGES = 5
+
+
+def write_instance(path: str, n: int, identical: bool = False, seed: int = 440):
+    """ Writes a complete instance with n residents and n hospitals. """
+    rng = random.Random(seed)
+    resident_names = [f"r{i}" for i in range(n)]
+    hospital_names = [f"h{i}" for i in range(n)]
+    shared = " ".join(rng.sample(hospital_names, n))
+    with open(path, "w") as f:
+        f.write(f"{n}\n")
+        for resident in resident_names:
+            f.write(resident + " " + (shared if identical else " ".join(rng.sample(hospital_names, n))) + "\n")
+        for hospital in hospital_names:
+            f.write(hospital + " " + " ".join(rng.sample(resident_names, n)) + "\n")
+
+
+def legacy_gale_shapley(residents, hospitals):
+    """ The original loop: list.pop(0) for free residents and list.index to compare. """
+    n = len(residents)
+    matches = {}
+    free_residents = list(residents.keys())
+    proposals = {}
+
+    while free_residents:
+        resident = free_residents.pop(0)
+        preferences = residents[resident]
+        if resident not in proposals:
+            proposals[resident] = 0
+        index = proposals[resident]
+        if index < n:
+            hospital = preferences[index]
+            proposals[resident] += 1
+            if hospital not in matches:
+                matches[hospital] = resident
+            else:
+                current = matches[hospital]
+                ranking = hospitals[hospital]
+                if ranking.index(resident) < ranking.index(current):
+                    matches[hospital] = resident
+                    free_residents.append(current)
+                else:
+                    free_residents.append(resident)
+
+    return matches
+
+
+def timed(function, *args):
+    start = time.perf_counter()
+    result = function(*args)
+    return result, time.perf_counter() - start
+
+
+def bench(n: int, identical: bool):
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, f"instance_{n}.txt")
+        binary_path = os.path.join(directory, f"instance_{n}.bin")
+        write_instance(path, n, identical)
+        (residents, hospitals), parse_seconds = timed(matching.read_preferences, path)
+        instance, intern_seconds = timed(matching.load_instance, path)
+        matching.save_binary_instance(binary_path, *instance)
+        binary_instance, binary_seconds = timed(matching.load_binary_instance, binary_path)
+
+        matches, seconds = timed(matching.gale_shapley, residents, hospitals)
+        legacy_matches, legacy_seconds = timed(legacy_gale_shapley, residents, hospitals)
+        assert matches == legacy_matches
+
+        resident_names, hospital_names, resident_ids, hospital_ids, _ = binary_instance
+        id_matches, id_seconds = timed(matching.gale_shapley, resident_ids, hospital_ids)
+        assert {hospital_names[h]: resident_names[r] for h, r in id_matches.items()} == matches
+        blocking, verify_seconds = timed(matching.verify_stable, resident_ids, hospital_ids, id_matches)
+        assert blocking == []
+        del binary_instance, resident_ids, hospital_ids
+
+    kind = "identical" if identical else "random"
+    print(f"n={n:>6} {kind:>9}  parse {parse_seconds:8.3f}s  interned {intern_seconds:8.3f}s  binary {binary_seconds:8.3f}s")
+    print(f"{'':>16}  gale_shapley {seconds:8.3f}s  on ids {id_seconds:8.3f}s  legacy {legacy_seconds:8.3f}s")
+    print(f"{'':>16}  verify_stable {verify_seconds:8.3f}s")
+
+
+def bench_rematch(n: int, identical: bool, seed: int = 440):
+    rng = random.Random(seed)
+    hospital_names = [f"h{i}" for i in range(n)]
+    shared = rng.sample(hospital_names, n)
+    residents = {f"r{i}": list(shared) if identical else rng.sample(hospital_names, n) for i in range(n)}
+    hospitals = {hospital: rng.sample(list(residents), n) for hospital in hospital_names}
+    matches = matching.gale_shapley(residents, hospitals)
+    resident_ranks = matching.rank_matrix(residents)
+    hospital_ranks = matching.rank_matrix(hospitals)
+
+    changed = rng.sample(list(residents), REMATCH_CHANGES)
+    for resident in changed:
+        rng.shuffle(residents[resident])
+    del hospitals[hospital_names[0]]
+
+    full, full_seconds = timed(matching.gale_shapley, residents, hospitals)
+    repaired, seconds = timed(matching.rematch, residents, hospitals, matches, changed, (),
+                              resident_ranks, hospital_ranks)
+    same = "same matching" if repaired == full else "different stable matching"
+    print(f"{'':>16}  rematch {seconds:8.3f}s  full rerun {full_seconds:8.3f}s  ({same})")
+
+
+def many_to_one_instance(resident_count: int, hospital_count: int, list_length: int, seed: int = 440):
+    """ Builds partial preference lists where each hospital ranks exactly the residents that listed it. """
+    rng = random.Random(seed)
+    hospital_names = [f"h{i}" for i in range(hospital_count)]
+    residents = {f"r{i}": rng.sample(hospital_names, list_length) for i in range(resident_count)}
+    hospitals = {hospital: [] for hospital in hospital_names}
+    for resident, preferences in residents.items():
+        for hospital in preferences:
+            hospitals[hospital].append(resident)
+    for ranking in hospitals.values():
+        rng.shuffle(ranking)
+    return residents, hospitals
+
+
+def bench_many_to_one():
+    residents, hospitals = many_to_one_instance(MANY_RESIDENTS, MANY_HOSPITALS, LIST_LENGTH)
+    capacities = dict.fromkeys(hospitals, MANY_SLOTS)
+
+    assignments, seconds = timed(matching.hospital_residents, residents, hospitals, capacities)
+    matched = sum(len(held) for held in assignments.values())
+    print(f"many-to-one {MANY_RESIDENTS} residents, {MANY_HOSPITALS * MANY_SLOTS} slots"
+          f"  hospital_residents {seconds:8.3f}s  matched {matched}")
+
+
+if __name__ == '__main__':
+    sizes = [int(arg) for arg in sys.argv[1:]] or [1000, 2000]
+    for n in sizes:
+        bench(n, False)
+        bench_rematch(n, False)
+        bench(n, True)
+        bench_rematch(n, True)
+    bench_many_to_one()
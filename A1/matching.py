@@ -1,95 +1,440 @@
-
+import csv
+import heapq
+import io
+import json
+import mmap
+import struct
 import sys
 import time
+from array import array
+from collections import deque
+from itertools import chain
+from operator import indexOf
 
-# Track time.
-start_time = time.time()
-
-# Check for bad file input.
 try:
-    file_name = sys.argv[1]
-except IndexError:
-    exit(1)
-
-# Loops to populate lists of residents and hospitals to be used in the algorithm.
-with open(file_name, "r") as f:
-    n = int(f.readline())
-    residents = {} 
-    hospitals = {} 
-    for i in range(n):
-        line = f.readline().split() 
-        resident = line[0] 
-        preferences = line[1:] 
-        residents[resident] = preferences
+    import numpy
+except ImportError:
+    numpy = None
+
+# Binary instance header: signature, format version, whether hospital slot
+# counts follow the preference lists, number of residents, number of
+# hospitals and length of the encoded name table. Integers are stored in
+# native byte order so the file can be mapped and used without copying.
+INSTANCE_MAGIC = b"GSIN"
+INSTANCE_VERSION = 1
+INSTANCE_HEADER = struct.Struct("=4sBBIIQ")
+
+# key_ids hashes name keys by multiplying with an odd 64-bit constant (2^64
+# over the golden ratio) into a table of at least KEY_SLOTS slots per name,
+# sparse enough that few lookups have to probe.
+HASH_MULTIPLIER = 0x9E3779B97F4A7C15
+KEY_SLOTS = 64
+
+
+def read_preferences(file_name):
+    """
+    Reads an instance file and returns the preference lists of the residents
+    and of the hospitals, each as a dict mapping a name to a list of names.
+    """
+    # Loops to populate lists of residents and hospitals to be used in the algorithm.
+    with open(file_name, "r") as f:
+        n = int(f.readline())
+        residents = {}
+        hospitals = {}
+        for i in range(n):
+            line = f.readline().split()
+            resident = line[0]
+            preferences = line[1:]
+            residents[resident] = preferences
 # Invariant: At any point in the loop, the number of items in the residents
 # list will be less than or equal to 'range(n)'.
-        
-# Initialization: At the initialization of this for loop the list of 
+
+# Initialization: At the initialization of this for loop the list of
 # available residents will be empty (i.e. 0), and since 'range(n) cannot be
 # negative, the invariant holds true.
-        
+
 # Maintenance: As elements are added to the residents list, the list grows
 # in size as long as it is less than 'range(n)' meaning the invariant holds
 # true.
-        
+
 # Termination: This loop terminates once i is no longer in range(n), and in this
 # case the list will be filled with all available residents as range(n) is
 # equal to the input size, this proving the invariant true.
-        
-    for i in range(n):
-        line = f.readline().split() 
-        hospital = line[0]
-        preferences = line[1:]
-        hospitals[hospital] = preferences
+
+        for i in range(n):
+            line = f.readline().split()
+            hospital = line[0]
+            preferences = line[1:]
+            hospitals[hospital] = preferences
 # Invariant: At any point in the loop, the number of items in the hospitals
 # list will be less than or equal to 'range(n)'.
-        
-# Initialization: At the initialization of this for loop the list of 
+
+# Initialization: At the initialization of this for loop the list of
 # available hospitals will be empty (i.e. 0), and since 'range(n) cannot be
 # negative, the invariant holds true.
-        
+
 # Maintenance: As elements are added to the hospitals list, the list grows
 # in size as long as it is less than 'range(n)' meaning the invariant holds
 # true.
-        
+
 # Termination: This loop terminates once i is no longer in range(n), and in this
 # case the list will be filled with all available hospitals as range(n) is
 # equal to the input size, this proving the invariant true.
 
-matches = {}
-free_residents = list(residents.keys())
-proposals = {}
-
-# Gale-Shapley Algorithm Code.
-while free_residents: 
-    resident = free_residents.pop(0) 
-    preferences = residents[resident] 
-    if resident not in proposals: 
-        proposals[resident] = 0 
-    index = proposals[resident] 
-    if index < n: 
-        hospital = preferences[index] 
-        proposals[resident] += 1 
-        if hospital not in matches: 
-            matches[hospital] = resident 
-        else: 
-            current = matches[hospital] 
-            ranking = hospitals[hospital] 
-            if ranking.index(resident) < ranking.index(current): 
-                matches[hospital] = resident 
-                free_residents.append(current)
-            else:
+    return residents, hospitals
+
+
+def read_capacitated_preferences(file_name):
+    """
+    Reads a many-to-one instance file. The first line holds the number of
+    residents and the number of hospitals, each resident line holds a name
+    followed by its (possibly partial) preference list, and each hospital
+    line holds a name, its number of slots and its preference list.
+
+    Returns the resident preferences, the hospital preferences and a dict
+    mapping each hospital to its number of slots.
+    """
+    with open(file_name, "r") as f:
+        resident_count, hospital_count = map(int, f.readline().split())
+        residents = {}
+        hospitals = {}
+        capacities = {}
+        for i in range(resident_count):
+            line = f.readline().split()
+            residents[line[0]] = line[1:]
+        for i in range(hospital_count):
+            line = f.readline().split()
+            hospitals[line[0]] = line[2:]
+            capacities[line[0]] = int(line[1])
+
+    return residents, hospitals, capacities
+
+
+def load_instance(file_name, many_to_one=False):
+    """
+    Reads an instance file (in the format of read_preferences, or of
+    read_capacitated_preferences when many_to_one is set) and interns every
+    name to an integer id.
+
+    Returns the resident names, the hospital names, the resident and
+    hospital preferences as dicts mapping an id to an array('i') of ids,
+    and the hospital slot counts as an array('i') (None for one-to-one
+    instances). The preference dicts can be passed straight to
+    gale_shapley and hospital_residents.
+
+    With numpy, files of ASCII names of at most 8 bytes are tokenized and
+    interned in bulk by tokenize_instance, with no Python object per token.
+    Other files are parsed by read_preferences or
+    read_capacitated_preferences and interned with one dict lookup per name.
+    """
+    if numpy is not None:
+        with open(file_name, "rb") as f:
+            instance = tokenize_instance(f.read(), many_to_one)
+        if instance is not None:
+            return instance
+
+    if many_to_one:
+        residents, hospitals, capacities = read_capacitated_preferences(file_name)
+        capacities = array('i', capacities.values())
+    else:
+        residents, hospitals = read_preferences(file_name)
+        capacities = None
+    resident_names = list(residents)
+    hospital_names = list(hospitals)
+    resident_ids = dict(zip(resident_names, range(len(resident_names))))
+    hospital_ids = dict(zip(hospital_names, range(len(hospital_names))))
+    residents = {resident_ids[resident]: array('i', map(hospital_ids.__getitem__, preferences))
+                 for resident, preferences in residents.items()}
+    hospitals = {hospital_ids[hospital]: array('i', map(resident_ids.__getitem__, preferences))
+                 for hospital, preferences in hospitals.items()}
+
+    return resident_names, hospital_names, residents, hospitals, capacities
+
+
+def tokenize_instance(text, many_to_one=False):
+    """
+    The numpy path of load_instance, for the bytes of an instance file.
+    Returns None when the file does not suit it: a byte outside ASCII, a
+    control character that str.split would not take for whitespace, a
+    token longer than 8 bytes or a repeated name.
+
+    Every token is packed into a uint64 key from its bytes, so keys are
+    equal exactly when tokens are, and the keys of all preference lists are
+    turned into ids in one call to key_ids.
+    """
+    size = len(text)
+    data = numpy.frombuffer(text + bytes(8), dtype=numpy.uint8)
+    body = data[:size]
+    if not size or (body >= 128).any() or (body < 9).any() or ((body - numpy.uint8(14)) < 14).any():
+        return None
+
+    # Bytes up to 32 are now exactly the characters str.split breaks on.
+    space = numpy.ones(size + 1, dtype=bool)
+    numpy.less_equal(body, 32, out=space[1:])
+    starts = numpy.flatnonzero(space[:-1] > space[1:])
+    if not len(starts):
+        return None
+
+    # Load the 8 bytes at each token start and flag the bytes below 33 in
+    # each word at once. A borrow can only flag bytes above a real one, so
+    # the lowest flag marks where the token ends. Unflagged words hold 8
+    # token bytes, which is too long unless the ninth byte is a space.
+    words = numpy.lib.stride_tricks.as_strided(data, shape=(size, 8), strides=(1, 1))[starts].view("<u8").ravel()
+    flags = (words - numpy.uint64(0x2121212121212121)) & ~words & numpy.uint64(0x8080808080808080)
+    full = numpy.flatnonzero(flags == 0)
+    if (data[starts[full] + 8] > 32).any():
+        return None
+    lowest = flags & (~flags + numpy.uint64(1))
+    keys = words & ((lowest >> numpy.uint64(7)) - numpy.uint64(1))
+
+    def token(index):
+        start = int(starts[index])
+        return text[start:start + 9].split()[0].decode()
+
+    # The token range of every non-empty line, header first.
+    bounds = numpy.searchsorted(starts, numpy.flatnonzero(body == 10) + 1).tolist()
+    bounds = [0] + bounds + [len(starts)]
+    lines = [(first, end) for first, end in zip(bounds, bounds[1:]) if first < end]
+    header = [int(token(index)) for index in range(*lines[0])]
+    resident_count = header[0]
+    hospital_count = header[1] if many_to_one else resident_count
+    resident_lines = lines[1:1 + resident_count]
+    hospital_lines = lines[1 + resident_count:1 + resident_count + hospital_count]
+    if len(hospital_lines) < hospital_count:
+        raise ValueError("the instance has fewer lines than its header gives")
+
+    resident_names = [token(first) for first, _ in resident_lines]
+    hospital_names = [token(first) for first, _ in hospital_lines]
+    if len(set(resident_names)) < resident_count or len(set(hospital_names)) < hospital_count:
+        return None
+    capacities = array('i', (int(token(first + 1)) for first, _ in hospital_lines)) if many_to_one else None
+
+    preferences = []
+    for names, lines, skip in ((hospital_lines, resident_lines, 1), (resident_lines, hospital_lines, 2 if many_to_one else 1)):
+        # Blank lines hold no tokens, so the lines' tokens are one range.
+        start = lines[0][0]
+        listed = numpy.ones(lines[-1][1] - start, dtype=bool)
+        firsts = numpy.array([first for first, _ in lines]) - start
+        for offset in range(skip):
+            listed[firsts + offset] = False
+        tokens = numpy.flatnonzero(listed) + start
+        ids = key_ids(keys[[first for first, _ in names]], keys[tokens])
+        if (ids < 0).any():
+            raise KeyError(token(tokens[numpy.argmin(ids)]))
+        flat = ids.astype(numpy.int32).tobytes()
+        agents = {}
+        offset = 0
+        for agent, (first, end) in enumerate(lines):
+            length = 4 * (end - first - skip)
+            agents[agent] = array('i', flat[offset:offset + length])
+            offset += length
+        preferences.append(agents)
+
+    return resident_names, hospital_names, preferences[0], preferences[1], capacities
+
+
+def key_ids(names, keys):
+    """
+    Given the distinct uint64 keys of some names, returns the position in
+    names of each of keys, or -1 where a key is not among them.
+
+    The names go into an open addressing table with at least KEY_SLOTS
+    slots per name, indexed by the top bits of key times HASH_MULTIPLIER.
+    Every key is looked up at once, and only the few keys that land on
+    another name's slot probe on to the next one.
+    """
+    bits = (KEY_SLOTS * max(len(names), 1)).bit_length()
+    mask = (1 << bits) - 1
+    shift = numpy.uint64(64 - bits)
+    multiplier = numpy.uint64(HASH_MULTIPLIER)
+    table = numpy.full(1 << bits, -1, dtype=numpy.int32)
+    slots = ((names * multiplier) >> shift).astype(numpy.intp)
+    table[slots] = numpy.arange(len(names), dtype=numpy.int32)
+    # Names that lost their slot to another name probe for a free one.
+    for name in numpy.flatnonzero(table.take(slots) != numpy.arange(len(names))).tolist():
+        slot = int(slots[name])
+        while table[slot] >= 0:
+            slot = (slot + 1) & mask
+        table[slot] = name
+
+    slots = ((keys * multiplier) >> shift).astype(numpy.intp)
+    ids = table.take(slots)
+    pending = numpy.flatnonzero(names.take(ids) != keys)
+    while len(pending):
+        pending = pending[ids[pending] >= 0]
+        slots[pending] = (slots[pending] + 1) & mask
+        ids[pending] = table.take(slots[pending])
+        pending = pending[names.take(ids[pending]) != keys[pending]]
+    return ids
+
+
+def save_binary_instance(file_name, resident_names, hospital_names, residents, hospitals, capacities=None):
+    """
+    Writes an instance returned by load_instance in the binary format read
+    by load_binary_instance.
+    """
+    names = "\n".join(resident_names + hospital_names).encode()
+    with open(file_name, "wb") as f:
+        f.write(INSTANCE_HEADER.pack(INSTANCE_MAGIC, INSTANCE_VERSION, capacities is not None,
+                                     len(resident_names), len(hospital_names), len(names)))
+        f.write(names)
+        f.write(bytes(-f.tell() % 8))
+
+        for preferences in (residents, hospitals):
+            offsets = array('q', [0])
+            for agent in range(len(preferences)):
+                offsets.append(offsets[-1] + len(preferences[agent]))
+            offsets.tofile(f)
+            for agent in range(len(preferences)):
+                array('i', preferences[agent]).tofile(f)
+            f.write(bytes(-f.tell() % 8))
+
+        if capacities is not None:
+            array('i', capacities).tofile(f)
+
+
+def load_binary_instance(file_name):
+    """
+    Maps a file written by save_binary_instance into memory and returns the
+    same values as load_instance. Preference lists are memoryview slices of
+    the mapped file, so nothing is parsed or copied.
+    """
+    with open(file_name, "rb") as f:
+        mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    magic, version, has_capacities, resident_count, hospital_count, names_length = INSTANCE_HEADER.unpack_from(mapped)
+    if magic != INSTANCE_MAGIC or version != INSTANCE_VERSION:
+        raise ValueError(f"{file_name} is not a binary instance")
+
+    position = INSTANCE_HEADER.size
+    names = bytes(mapped[position:position + names_length]).decode().split("\n")
+    resident_names = names[:resident_count]
+    hospital_names = names[resident_count:]
+    position += names_length
+    position += -position % 8
+
+    view = memoryview(mapped)
+    preferences = []
+    for count in (resident_count, hospital_count):
+        offsets = view[position:position + 8 * (count + 1)].cast('q')
+        position += 8 * (count + 1)
+        flat = view[position:position + 4 * offsets[count]].cast('i')
+        position += 4 * offsets[count]
+        position += -position % 8
+        preferences.append({agent: flat[offsets[agent]:offsets[agent + 1]] for agent in range(count)})
+
+    capacities = view[position:position + 4 * hospital_count].cast('i') if has_capacities else None
+
+    return resident_names, hospital_names, preferences[0], preferences[1], capacities
+
+
+def is_binary_instance(file_name):
+    """
+    Returns True if the file starts with the binary instance signature.
+    """
+    with open(file_name, "rb") as f:
+        return f.read(len(INSTANCE_MAGIC)) == INSTANCE_MAGIC
+
+
+def rank_matrix(hospitals):
+    """
+    Precomputes, for every hospital, the position of each resident in its
+    preference list so comparing two residents is a lookup instead of a
+    list.index scan. Works the same way on the residents' preferences.
+    """
+    return {hospital: dict(zip(ranking, range(len(ranking))))
+            for hospital, ranking in hospitals.items()}
+
+
+def prefix_rank(ranking, resident):
+    """
+    The positions in a hospital's preference list of every resident up to
+    and including resident, or of the whole list if resident is not on it.
+    """
+    try:
+        end = indexOf(ranking, resident) + 1
+    except ValueError:
+        end = len(ranking)
+    return dict(zip(ranking[:end], range(end)))
+
+
+def record_stats(stats, setup_start, loop_start, proposals, matched, requeued):
+    """
+    Fills stats with the phase timings and counters of a proposal run.
+    Every proposal either creates a holding or is turned away, and every
+    holding that does not last to the end was lost to a better resident, so
+    rejections (including displacements) are proposals minus final pairs.
+    requeued is the peak number of residents back in the queue after being
+    turned away or displaced.
+    """
+    stats["setup"] = loop_start - setup_start
+    stats["proposal_loop"] = time.perf_counter() - loop_start
+    stats["proposals"] = sum(proposals.values())
+    stats["rejections"] = stats["proposals"] - matched
+    stats["max_requeued"] = requeued
+    stats["max_proposals"] = max(proposals.values(), default=0)
+
+
+def gale_shapley(residents, hospitals, stats=None):
+    """
+    Runs the resident-proposing Gale-Shapley algorithm and returns a dict
+    mapping each matched hospital to its resident.
+
+    Free residents wait in a deque. A hospital's rank dict is built by
+    prefix_rank at its first proposal and then makes every comparison a
+    lookup. A hospital that takes its first proposer never becomes free
+    again, so its dict only has to reach that resident: anyone outside it
+    comes later in the list and is turned away. On random instances that
+    is a fraction of each list, and the whole run is still O(n^2) in the
+    worst case. A hospital rejects any resident missing from its list, and
+    residents skip hospitals that have no list at all.
+
+    If a stats dict is passed, it is filled by record_stats.
+    """
+    setup_start = time.perf_counter()
+    ranks = {}
+    matches = {}
+    free_residents = deque(residents)
+    proposals = dict.fromkeys(residents, 0)
+    first_pass = len(residents)
+    requeued = 0
+    loop_start = time.perf_counter()
+
+    # Gale-Shapley Algorithm Code.
+    while free_residents:
+        resident = free_residents.popleft()
+        preferences = residents[resident]
+        index = proposals[resident]
+        if index < len(preferences):
+            hospital = preferences[index]
+            proposals[resident] += 1
+            ranking = ranks.get(hospital)
+            if ranking is None:
+                ranking = ranks[hospital] = prefix_rank(hospitals[hospital], resident) if hospital in hospitals else {}
+            if resident not in ranking:
                 free_residents.append(resident)
+            elif hospital not in matches:
+                matches[hospital] = resident
+            else:
+                current = matches[hospital]
+                if ranking[resident] < ranking[current]:
+                    matches[hospital] = resident
+                    free_residents.append(current)
+                else:
+                    free_residents.append(resident)
+        first_pass -= 1
+        if not first_pass:
+            requeued = len(free_residents)
 # Invariant: At any point in the algorithm, for every hospital and every
-# resident, if a hospital is removed from a resident's preference list, 
+# resident, if a hospital is removed from a resident's preference list,
 # then that hospital has a resident that it prefers over that resident.
-                
-# Initialization: This invariant is true before entering the loop as both 
+
+# Initialization: This invariant is true before entering the loop as both
 # resident and hospital preference lists have not had any elements removed
 # yet which fulfulls the invariant property.
-                
+
 # Maintenance: The list 'free_residents' consists of the list of available
-# residents, through the loop a resident is removed from this list and 
+# residents, through the loop a resident is removed from this list and
 # added to 'proposals' if it was not there already. This resident is then
 # assigned to the 'index' variable which if it is less than 'n' (the input size),
 # then it is added to the hospital's preference list. From here there are
@@ -98,15 +443,459 @@ while free_residents:
 # the current resident, or the resident is made the new preference if it is
 # preferred to the old resident, in both cases the invariant holds true as
 # the most preferred resident is always at the top spot.
-                
-# Termination: This loop terminates once the free_residents list has run 
+
+# Termination: This loop terminates once the free_residents list has run
 # out of items, and if there are no more elements in this list that means
 # the algorithm is complete and all residents have been paired with a
 # hospital.
 
-# Print out results.
-for hospital, resident in matches.items():
-    print(f"{resident} {hospital}")
-time_complexity = time.time() - start_time
-time_complexity_string = repr(time_complexity)
-sys.stderr.write(time_complexity_string)
+    if stats is not None:
+        # During the first pass every proposal takes one resident who has
+        # not proposed yet off the queue and puts back at most one who has,
+        # so the residents waiting to propose again only grow. After it each
+        # proposal takes one of them off and puts back at most one, so they
+        # peak when the first pass ends.
+        record_stats(stats, setup_start, loop_start, proposals, len(matches), requeued)
+
+    return matches
+
+
+def hospital_residents(residents, hospitals, capacities, stats=None):
+    """
+    Runs the resident-proposing algorithm for the many-to-one (college
+    admissions) problem and returns a dict mapping each hospital to the list
+    of residents it takes, best first.
+
+    Preference lists may be partial: a resident only proposes to hospitals
+    on its list, and a hospital rejects any resident missing from its own.
+    Each hospital keeps the residents it holds in a heap ordered worst
+    first, so checking and replacing its worst resident is O(log q) for a
+    hospital with q slots.
+
+    If a stats dict is passed, it is filled by record_stats.
+    """
+    setup_start = time.perf_counter()
+    ranks = rank_matrix(hospitals)
+    holdings = {hospital: [] for hospital in hospitals}
+    free_residents = deque(residents)
+    proposals = dict.fromkeys(residents, 0)
+    first_pass = len(residents)
+    requeued = 0
+    loop_start = time.perf_counter()
+
+    while free_residents:
+        resident = free_residents.popleft()
+        preferences = residents[resident]
+
+        # Propose down the list until a hospital holds on to this resident,
+        # or the list runs out and the resident stays unmatched.
+        while proposals[resident] < len(preferences):
+            hospital = preferences[proposals[resident]]
+            proposals[resident] += 1
+
+            rank = ranks.get(hospital, {}).get(resident)
+            if rank is None:
+                continue
+
+            held = holdings[hospital]
+            if len(held) < capacities[hospital]:
+                heapq.heappush(held, (-rank, resident))
+                break
+            if held and -held[0][0] > rank:
+                _, worst = heapq.heapreplace(held, (-rank, resident))
+                free_residents.append(worst)
+                break
+        first_pass -= 1
+        if not first_pass:
+            requeued = len(free_residents)
+
+    if stats is not None:
+        matched = sum(len(held) for held in holdings.values())
+        # As in gale_shapley, the displaced residents waiting to propose
+        # again are most numerous when the first pass ends.
+        record_stats(stats, setup_start, loop_start, proposals, matched, requeued)
+
+    return {hospital: [resident for _, resident in sorted(held, reverse=True)]
+            for hospital, held in holdings.items()}
+
+
+def rematch(residents, hospitals, matches, changed_residents=(), changed_hospitals=(),
+            resident_ranks=None, hospital_ranks=None):
+    """
+    Repairs a stable matching after a few preference lists change, instead
+    of running gale_shapley again from scratch, and returns the new dict
+    mapping each matched hospital to its resident.
+
+    residents and hospitals hold the new preferences, with withdrawn agents
+    removed (their names may still appear in other agents' lists). matches
+    is the previous stable matching, and changed_residents and
+    changed_hospitals name the agents whose lists changed or who are new.
+
+    Residents whose lists changed propose again from the top of their list,
+    and residents who lose their hospital carry on from the next one, as in
+    gale_shapley. Hospitals whose lists changed, or who lose their resident,
+    look down their list for the first resident that would rather be with
+    them, and take that resident over. Only these agents and the chains of
+    moves they start are touched, and the result is stable, though it can
+    be a different stable matching than a full run would find. As in
+    gale_shapley, a hospital never holds a resident missing from its list,
+    so a hospital whose new list drops its resident lets that resident go.
+
+    resident_ranks and hospital_ranks are the results of rank_matrix for
+    both sides. Passing them in avoids rebuilding them on every call; the
+    rows of changed agents are updated in place. If the repair takes more
+    proposals than a full run could, it falls back to gale_shapley.
+    """
+    if resident_ranks is None:
+        resident_ranks = rank_matrix(residents)
+    else:
+        resident_ranks.update(rank_matrix({resident: residents[resident] for resident in changed_residents if resident in residents}))
+    if hospital_ranks is None:
+        hospital_ranks = rank_matrix(hospitals)
+    else:
+        hospital_ranks.update(rank_matrix({hospital: hospitals[hospital] for hospital in changed_hospitals if hospital in hospitals}))
+
+    held = {}
+    match_of = {}
+    pointer = {}
+    free_residents = deque()
+    affected_hospitals = deque(hospital for hospital in changed_hospitals if hospital in hospitals)
+    changed = set(changed_residents)
+
+    # Keep every pair of the old matching that the changes did not touch.
+    for hospital, resident in matches.items():
+        if hospital not in hospitals:
+            if resident in residents and resident not in changed:
+                pointer[resident] = resident_ranks[resident].get(hospital, -1) + 1
+                free_residents.append(resident)
+        elif resident not in residents or resident in changed:
+            affected_hospitals.append(hospital)
+        elif resident not in hospital_ranks[hospital]:
+            # The hospital's new list drops its resident, who carries on
+            # down its own list and leaves the hospital to look again.
+            pointer[resident] = resident_ranks[resident][hospital] + 1
+            free_residents.append(resident)
+            affected_hospitals.append(hospital)
+        else:
+            held[hospital] = resident
+            match_of[resident] = hospital
+
+    for resident in changed:
+        if resident in residents:
+            pointer[resident] = 0
+            free_residents.append(resident)
+
+    budget = 2 * sum(len(preferences) for preferences in residents.values())
+    steps = 0
+
+    while free_residents or affected_hospitals:
+        # Let free residents propose exactly as in gale_shapley.
+        while free_residents:
+            resident = free_residents.popleft()
+            preferences = residents[resident]
+            while pointer[resident] < len(preferences):
+                hospital = preferences[pointer[resident]]
+                pointer[resident] += 1
+                steps += 1
+                if hospital not in hospitals:
+                    continue
+                ranking = hospital_ranks[hospital]
+                if resident not in ranking:
+                    continue
+                current = held.get(hospital)
+                if current is None or ranking[resident] < ranking[current]:
+                    held[hospital] = resident
+                    match_of[resident] = hospital
+                    if current is not None:
+                        del match_of[current]
+                        pointer[current] = resident_ranks[current][hospital] + 1
+                        free_residents.append(current)
+                    break
+
+        if steps > budget:
+            return gale_shapley(residents, hospitals)
+
+        # Then let one hospital that got worse take back the best resident
+        # that would rather be there.
+        if affected_hospitals:
+            hospital = affected_hospitals.popleft()
+            if hospital not in hospitals:
+                continue
+            ranking = hospitals[hospital]
+            current = held.get(hospital)
+            limit = hospital_ranks[hospital][current] if current is not None else len(ranking)
+            for position in range(limit):
+                resident = ranking[position]
+                if resident not in residents:
+                    continue
+                rank = resident_ranks[resident].get(hospital)
+                previous = match_of.get(resident)
+                if rank is None or (previous is not None and resident_ranks[resident][previous] < rank):
+                    continue
+
+                if previous is not None:
+                    del held[previous]
+                    affected_hospitals.append(previous)
+                held[hospital] = resident
+                match_of[resident] = hospital
+                if current is not None:
+                    del match_of[current]
+                    pointer[current] = resident_ranks[current][hospital] + 1
+                    free_residents.append(current)
+                steps += 1
+                break
+
+    return held
+
+
+def verify_stable(residents, hospitals, matches, hospital_ranks=None):
+    """
+    Checks a one-to-one matching (a dict mapping hospitals to residents)
+    and returns every blocking pair as a list of (resident, hospital)
+    tuples. The matching is stable if the list is empty.
+
+    A resident and a hospital block when the resident lists the hospital
+    above its match (or is unmatched), and the hospital lists the resident
+    above its own match (or is unmatched). A partner missing from an
+    agent's list counts as no partner at all. Only the part of each resident's
+    list above its match is looked at.
+
+    Instances with integer ids, as returned by load_instance, are checked
+    with numpy when it is installed: the hospital ranks go into one integer
+    matrix and each resident's list is compared in a single vectorized
+    step. Ids too sparse for that matrix, and other instances, use
+    hospital_ranks (the result of rank_matrix), built if it is not passed
+    in.
+    """
+    if numpy is not None and all(isinstance(agent, int) for agent in residents) \
+            and all(isinstance(agent, int) for agent in hospitals):
+        blocking = verify_stable_ids(residents, hospitals, matches)
+        if blocking is not None:
+            return blocking
+
+    if hospital_ranks is None:
+        hospital_ranks = rank_matrix(hospitals)
+    match_of = {resident: hospital for hospital, resident in matches.items()}
+    blocking = []
+
+    for resident, preferences in residents.items():
+        current = match_of.get(resident)
+        for hospital in preferences:
+            if hospital == current:
+                break
+            ranking = hospital_ranks.get(hospital)
+            if ranking is None or resident not in ranking:
+                continue
+            holder_rank = ranking.get(matches.get(hospital), len(ranking))
+            if ranking[resident] < holder_rank:
+                blocking.append((resident, hospital))
+
+    return blocking
+
+
+def verify_stable_ids(residents, hospitals, matches):
+    """
+    The numpy version of verify_stable, for preferences keyed by integer
+    ids. Uses an int32 matrix of size hospitals x residents, so it returns
+    None instead when the ids are too sparse for one: a negative id, or an
+    id at least twice the number of agents on its side.
+    """
+    rankings = {hospital: numpy.asarray(ranking, dtype=numpy.int64) for hospital, ranking in hospitals.items()}
+
+    # Hospital lists and matches may still name withdrawn residents (see
+    # rematch), so the matrix has a column for every id that appears.
+    resident_ids = [numpy.fromiter(chain(residents, matches.values()), dtype=numpy.int64)]
+    resident_ids.extend(ranking for ranking in rankings.values() if len(ranking))
+    hospital_ids = numpy.fromiter(chain(hospitals, matches), dtype=numpy.int64)
+    lowest = min((int(ids.min()) for ids in chain(resident_ids, [hospital_ids]) if len(ids)), default=0)
+    resident_count = max((int(ids.max()) for ids in resident_ids if len(ids)), default=-1) + 1
+    hospital_count = int(hospital_ids.max(initial=-1)) + 1
+    if lowest < 0 or resident_count > 2 * len(residents) + 1 or hospital_count > 2 * len(hospitals) + 1:
+        return None
+    unranked = numpy.iinfo(numpy.int32).max
+
+    ranks = numpy.full((hospital_count, resident_count), unranked, dtype=numpy.int32)
+    for hospital, ranking in rankings.items():
+        ranks[hospital, ranking] = numpy.arange(len(ranking), dtype=numpy.int32)
+
+    # Rank of each hospital's current resident, or unranked if it has none
+    # (or holds someone off its list), so any resident on its list beats it.
+    holder_rank = numpy.full(hospital_count, unranked, dtype=numpy.int32)
+    match_of = {}
+    for hospital, resident in matches.items():
+        holder_rank[hospital] = ranks[hospital, resident]
+        match_of[resident] = hospital
+
+    blocking = []
+    for resident, preferences in residents.items():
+        preferences = numpy.asarray(preferences, dtype=numpy.int64)
+        current = match_of.get(resident)
+        position = numpy.flatnonzero(preferences == current)
+        if len(position):
+            preferences = preferences[:position[0]]
+        preferences = preferences[(preferences >= 0) & (preferences < hospital_count)]
+        blocked = preferences[ranks[preferences, resident] < holder_rank[preferences]]
+        blocking.extend((resident, int(hospital)) for hospital in blocked)
+
+    return blocking
+
+
+def verify_stable_many(residents, hospitals, assignments, capacities, hospital_ranks=None):
+    """
+    Checks a many-to-one matching, as returned by hospital_residents (a
+    dict mapping each hospital to its list of residents), and returns every
+    blocking pair as a list of (resident, hospital) tuples.
+
+    A resident and a hospital block when the resident lists the hospital
+    above its assignment (or is unassigned), and the hospital lists the
+    resident and either has a free slot or ranks the resident above the
+    worst resident it holds. Otherwise it follows verify_stable's rules.
+    """
+    if hospital_ranks is None:
+        hospital_ranks = rank_matrix(hospitals)
+    assignment_of = {resident: hospital for hospital, held in assignments.items() for resident in held}
+    # Full hospitals only take residents they rank above their worst one.
+    worst_rank = {}
+    for hospital, ranking in hospital_ranks.items():
+        held = assignments.get(hospital, ())
+        if len(held) >= capacities[hospital]:
+            worst_rank[hospital] = max((ranking.get(resident, len(ranking)) for resident in held), default=-1)
+    blocking = []
+
+    for resident, preferences in residents.items():
+        current = assignment_of.get(resident)
+        for hospital in preferences:
+            if hospital == current:
+                break
+            ranking = hospital_ranks.get(hospital)
+            if ranking is None or resident not in ranking:
+                continue
+            if ranking[resident] < worst_rank.get(hospital, len(ranking)):
+                blocking.append((resident, hospital))
+
+    return blocking
+
+
+OUTPUT_FORMATS = ("text", "csv", "jsonl", "binary")
+
+
+def write_matches(pairs, resident_names, hospital_names, out, output_format="text"):
+    """
+    Writes (hospital, resident) id pairs to the binary file object out in a
+    single write.
+
+    text prints "resident hospital" lines as the script always has, csv and
+    jsonl print the same names with a header row or as one object per line,
+    and binary writes each pair as two native int32 ids (resident first) in
+    the order of the instance's name lists.
+    """
+    if output_format == "binary":
+        ids = array('i')
+        for hospital, resident in pairs:
+            ids.append(resident)
+            ids.append(hospital)
+        out.write(ids.tobytes())
+        return
+
+    if output_format == "csv":
+        buffer = io.StringIO()
+        writer = csv.writer(buffer, lineterminator="\n")
+        writer.writerow(("resident", "hospital"))
+        writer.writerows((resident_names[resident], hospital_names[hospital]) for hospital, resident in pairs)
+        text = buffer.getvalue()
+    elif output_format == "jsonl":
+        text = "".join(json.dumps({"resident": resident_names[resident], "hospital": hospital_names[hospital]}) + "\n"
+                       for hospital, resident in pairs)
+    else:
+        text = "".join(f"{resident_names[resident]} {hospital_names[hospital]}\n" for hospital, resident in pairs)
+
+    out.write(text.encode())
+
+
+if __name__ == '__main__':
+    # Track time.
+    start_time = time.perf_counter()
+
+    # Check for bad file input. -m selects the many-to-one mode for text
+    # instances, -b saves a binary copy of the instance for later runs, -s
+    # checks the matching for blocking pairs before printing it and -j
+    # writes phase timings and counters to stderr as JSON instead of the
+    # total time. -f picks one of OUTPUT_FORMATS and -o writes the results to
+    # a file instead of stdout.
+    arguments = sys.argv[1:]
+    many_to_one = False
+    binary_file = None
+    check_stability = False
+    json_stats = False
+    output_format = "text"
+    output_file = None
+    while arguments and arguments[0].startswith("-"):
+        flag = arguments.pop(0)
+        if flag == "-m":
+            many_to_one = True
+        elif flag == "-b" and arguments:
+            binary_file = arguments.pop(0)
+        elif flag == "-s":
+            check_stability = True
+        elif flag == "-j":
+            json_stats = True
+        elif flag == "-f" and arguments and arguments[0] in OUTPUT_FORMATS:
+            output_format = arguments.pop(0)
+        elif flag == "-o" and arguments:
+            output_file = arguments.pop(0)
+        else:
+            exit(1)
+    try:
+        file_name = arguments[0]
+    except IndexError:
+        exit(1)
+
+    stats = {}
+    if is_binary_instance(file_name):
+        instance = load_binary_instance(file_name)
+    else:
+        instance = load_instance(file_name, many_to_one)
+    resident_names, hospital_names, residents, hospitals, capacities = instance
+    if binary_file is not None:
+        save_binary_instance(binary_file, *instance)
+    stats["parse"] = time.perf_counter() - start_time
+
+    if capacities is not None:
+        assignments = hospital_residents(residents, hospitals, capacities, stats)
+        matches = [(hospital, resident) for hospital, held in assignments.items() for resident in held]
+    else:
+        assignments = gale_shapley(residents, hospitals, stats)
+        matches = assignments.items()
+
+    if check_stability:
+        verify_start = time.perf_counter()
+        if capacities is not None:
+            blocking = verify_stable_many(residents, hospitals, assignments, capacities)
+        else:
+            blocking = verify_stable(residents, hospitals, assignments)
+        stats["verify"] = time.perf_counter() - verify_start
+        for resident, hospital in blocking:
+            sys.stderr.write(f"blocking pair: {resident_names[resident]} {hospital_names[hospital]}\n")
+        if blocking:
+            exit(2)
+
+    # Print out results.
+    output_start = time.perf_counter()
+    if output_file is None:
+        sys.stdout.flush()
+        write_matches(matches, resident_names, hospital_names, sys.stdout.buffer, output_format)
+        sys.stdout.buffer.flush()
+    else:
+        with open(output_file, "wb") as out:
+            write_matches(matches, resident_names, hospital_names, out, output_format)
+    stats["output"] = time.perf_counter() - output_start
+
+    time_complexity = time.perf_counter() - start_time
+    if json_stats:
+        stats["total"] = time_complexity
+        stats["residents"] = len(residents)
+        stats["hospitals"] = len(hospitals)
+        sys.stderr.write(json.dumps(stats) + "\n")
+    else:
+        time_complexity_string = repr(time_complexity)
+        sys.stderr.write(time_complexity_string)
@@ -0,0 +1,211 @@
+import math
+import os
+import random
+import sys
+import time
+
+import convex_hull
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+"""
+Benchmarks for convex_hull.py.
+
+Usage: python benchmark.py [n ...]
+
+Each n builds four point clouds with integer coordinates: uniform in a
+square, on a circle, on one line, and drawn from only DUPLICATE_VALUES
+distinct points. Each cloud is timed with compute_hull's "monotone"
+engine, and the result is checked against the hull of the distinct points.
+The "divide" engine is timed on the same cloud while n is within
+DIVIDE_LIMITS for that cloud, and must return every vertex with no repeats.
+Its base case is cubic, and runs of equal x values send whole slices to
+it, so the divide engine is not timed at the largest sizes. When numpy is installed, hull_indices is also timed on the
+cloud as an (N,2) int64 array (building the array is not timed) and must
+return the same vertices as the list path. Sizes default to 10^3 through 10^7. The largest size
+needs several gigabytes.
+
+Before the clouds, orientation is timed on PREDICATE_CALLS triples of
+integer points, of random float points, and of nearly collinear float
+points that need the exact fallback. These are compared with the old
+EPSILON test on triangle_area, kept below as legacy_is_clockwise.
+
+Sizes of at least PARALLEL_MIN_POINTS also time the "parallel" engine on the
+uniform and circular clouds with 1, 2, 4, ... workers up to the number of
+CPUs.
+
+Last, a DynamicHull is grown from DYNAMIC_POINTS uniform points one insert
+at a time, then has a random half of them deleted. It is checked against
+compute_hull after every DYNAMIC_CHECK_EVERY changes, and the time per
+change is compared with calling compute_hull again. contains, extreme and
+tangents are timed on DYNAMIC_QUERIES random queries.
+"""
+
+SIZES = [10 ** 3, 10 ** 4, 10 ** 5, 10 ** 6, 10 ** 7]
+COORDINATE_RANGE = 10 ** 9
+DUPLICATE_VALUES = 100
+PREDICATE_CALLS = 10 ** 6
+DYNAMIC_POINTS = 10 ** 5
+DYNAMIC_CHECK_EVERY = 10 ** 4
+DYNAMIC_QUERIES = 10 ** 5
+DIVIDE_LIMITS = {"uniform": 10 ** 5, "circular": 10 ** 5, "collinear": 10 ** 5, "duplicates": 10 ** 5}
+
+
+def uniform(n: int, rng: random.Random):
+    return [(rng.randrange(COORDINATE_RANGE), rng.randrange(COORDINATE_RANGE)) for _ in range(n)]
+
+
+def circular(n: int, rng: random.Random):
+    radius = COORDINATE_RANGE // 2
+    points = []
+    for _ in range(n):
+        angle = rng.random() * math.tau
+        points.append((round(radius * math.cos(angle)), round(radius * math.sin(angle))))
+    return points
+
+
+def collinear(n: int, rng: random.Random):
+    points = []
+    for _ in range(n):
+        x = rng.randrange(COORDINATE_RANGE)
+        points.append((x, 3 * x + 7))
+    return points
+
+
+def duplicates(n: int, rng: random.Random):
+    values = uniform(DUPLICATE_VALUES, rng)
+    return [rng.choice(values) for _ in range(n)]
+
+
+DISTRIBUTIONS = {"uniform": uniform, "circular": circular, "collinear": collinear, "duplicates": duplicates}
+
+
+def legacy_is_clockwise(a, b, c):
+    """ The original test: float area compared against EPSILON. """
+    return convex_hull.triangle_area(a, b, c) < -convex_hull.EPSILON
+
+
+def bench_predicates(count: int):
+    rng = random.Random(440)
+    integers = [tuple(uniform(3, rng)) for _ in range(count)]
+    floats = [tuple((rng.random(), rng.random()) for _ in range(3)) for _ in range(count)]
+    # Points on the line y = x / 3, nudged by a few units in the last place.
+    nearly_collinear = []
+    for _ in range(count):
+        triple = []
+        for _ in range(3):
+            x = rng.random()
+            triple.append((x, math.nextafter(x / 3, rng.choice((0.0, 1.0)))))
+        nearly_collinear.append(tuple(triple))
+
+    for name, triples in (("int", integers), ("float", floats), ("near-collinear", nearly_collinear)):
+        for label, predicate in (("legacy", legacy_is_clockwise), ("orientation", convex_hull.orientation)):
+            start = time.perf_counter()
+            for a, b, c in triples:
+                predicate(a, b, c)
+            elapsed = time.perf_counter() - start
+            print(f"{name} triples: {label:11} {elapsed / count * 1e9:.0f}ns per call")
+
+
+def timed(points, engine: str):
+    start = time.perf_counter()
+    hull = convex_hull.compute_hull(list(points), engine)
+    return time.perf_counter() - start, hull
+
+
+def bench(n: int):
+    for name, make in DISTRIBUTIONS.items():
+        points = make(n, random.Random(440 + n))
+
+        elapsed, hull = timed(points, "monotone")
+        expected = convex_hull.monotone_chain_hull(list(set(points)))
+        assert hull == expected
+        print(f"{name} n={n}: monotone {elapsed:.4f}s ({len(hull)} hull points)")
+
+        if n <= DIVIDE_LIMITS[name]:
+            divide_elapsed, divide_hull = timed(points, "divide")
+            # divide keeps points that lie along a hull edge, so it may
+            # return more than the vertices, but never a repeat or a miss.
+            assert len(set(divide_hull)) == len(divide_hull) and set(hull) <= set(divide_hull)
+            if name == "duplicates":
+                assert sorted(divide_hull) == sorted(hull)
+            print(f"{name} n={n}: divide   {divide_elapsed:.4f}s ({len(divide_hull)} hull points, "
+                  f"{divide_elapsed / elapsed:.1f}x)")
+
+        if numpy is not None:
+            array = numpy.array(points, dtype=numpy.int64)
+            start = time.perf_counter()
+            indices = convex_hull.hull_indices(array)
+            array_elapsed = time.perf_counter() - start
+            assert [tuple(row) for row in array[indices].tolist()] == hull
+            print(f"{name} n={n}: numpy    {array_elapsed:.4f}s ({elapsed / array_elapsed:.1f}x faster than monotone)")
+
+        if name in ("uniform", "circular") and n >= convex_hull.PARALLEL_MIN_POINTS:
+            workers = 1
+            while workers <= (os.cpu_count() or 1):
+                start = time.perf_counter()
+                parallel = convex_hull.parallel_hull(list(points), workers)
+                parallel_elapsed = time.perf_counter() - start
+                assert parallel == hull
+                print(f"{name} n={n}: parallel with {workers} workers {parallel_elapsed:.4f}s "
+                      f"({elapsed / parallel_elapsed:.1f}x faster than monotone)")
+                workers *= 2
+
+
+def bench_dynamic(n: int):
+    rng = random.Random(440)
+    points = uniform(n, rng)
+    dynamic = convex_hull.DynamicHull()
+
+    def check(live):
+        assert dynamic.hull() == convex_hull.compute_hull(list(live), "monotone")
+
+    start = time.perf_counter()
+    for count, point in enumerate(points, 1):
+        dynamic.insert(point)
+        if count % DYNAMIC_CHECK_EVERY == 0:
+            insert_elapsed = time.perf_counter() - start
+            check(points[:count])
+            start = time.perf_counter() - insert_elapsed
+    insert_elapsed = time.perf_counter() - start
+
+    deleted = rng.sample(points, n // 2)
+    live = list(points)
+    start = time.perf_counter()
+    for count, point in enumerate(deleted, 1):
+        dynamic.delete(point)
+        if count % DYNAMIC_CHECK_EVERY == 0:
+            delete_elapsed = time.perf_counter() - start
+            for removed in deleted[count - DYNAMIC_CHECK_EVERY:count]:
+                live.remove(removed)
+            check(live)
+            start = time.perf_counter() - delete_elapsed
+    delete_elapsed = time.perf_counter() - start
+
+    start = time.perf_counter()
+    convex_hull.compute_hull(list(points), "monotone")
+    rebuild_elapsed = time.perf_counter() - start
+    print(f"dynamic n={n}: insert {insert_elapsed / n * 1e6:.1f}us, delete {delete_elapsed / len(deleted) * 1e6:.1f}us "
+          f"per change, compute_hull {rebuild_elapsed * 1e6:.0f}us per change")
+
+    queries = uniform(DYNAMIC_QUERIES, rng)
+    directions = [(rng.randint(-10, 10), rng.randint(1, 10)) for _ in range(DYNAMIC_QUERIES)]
+    for name, method, arguments in (("contains", dynamic.contains, queries),
+                                    ("extreme", dynamic.extreme, directions),
+                                    ("tangents", dynamic.tangents, queries)):
+        start = time.perf_counter()
+        for argument in arguments:
+            method(argument)
+        elapsed = time.perf_counter() - start
+        print(f"dynamic n={n}: {name:8} {elapsed / len(arguments) * 1e6:.1f}us per query")
+
+
+if __name__ == "__main__":
+    sizes = [int(arg) for arg in sys.argv[1:]] or SIZES
+    bench_predicates(PREDICATE_CALLS)
+    for n in sizes:
+        bench(n)
+    bench_dynamic(DYNAMIC_POINTS)
@@ -1,13 +1,49 @@
 
 import math
+import os
 import sys
+from array import array
+from bisect import bisect_left
+from bisect import bisect_right
+from concurrent.futures import ProcessPoolExecutor
+from itertools import chain
+from multiprocessing import shared_memory
 from typing import List
+from typing import Optional
 from typing import Tuple
 from functools import cmp_to_key
 
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
 EPSILON = sys.float_info.epsilon
 Point = Tuple[int, int]
 
+# Algorithms accepted by compute_hull.
+HULL_ENGINES = ("divide", "monotone", "parallel")
+
+# Parallel engine: inputs smaller than PARALLEL_MIN_POINTS are not worth a
+# process pool, and every worker gets SHARDS_PER_WORKER shards so uneven
+# shards even out. shared_points is the shared coordinate array a worker has
+# attached to.
+PARALLEL_MIN_POINTS = 1 << 16
+SHARDS_PER_WORKER = 4
+shared_points = None
+
+# hull_indices works on integer coordinates in int64. Every cross product is
+# at most twice the product of the x and y spans, so keeping that product and
+# each span below this keeps the arithmetic exact.
+EXACT_LIMIT = 1 << 62
+
+# orientation's floating point filter (Shewchuk's ccwerrboundA): when the
+# computed cross is larger than this times the sum of the magnitudes of its
+# two products, its sign is certain. The bound assumes every coordinate is
+# an exact float, which ints beyond FLOAT_EXACT_INT are not.
+ORIENTATION_BOUND = (3 + 8 * EPSILON) * EPSILON / 2
+FLOAT_EXACT_INT = 1 << 53
+
 mid = [0, 0]
 
 def y_intercept(p1: Point, p2: Point, x: int) -> float:
@@ -36,31 +72,81 @@ def triangle_area(a: Point, b: Point, c: Point) -> float:
     return ((cx - bx) * (by - ay) - (bx - ax) * (cy - by)) / 2
 
 
+def cross(a: Point, b: Point, c: Point) -> int:
+    """
+    Given three points a,b,c,
+    computes and returns twice the area of the triangle a,b,c with the sign
+    convention of triangle_area. There is no division, so the result is
+    exact for integer coordinates.
+    """
+    ax, ay = a
+    bx, by = b
+    cx, cy = c
+    return (cx - bx) * (by - ay) - (bx - ax) * (cy - by)
+
+
+def orientation(a: Point, b: Point, c: Point) -> int:
+    """
+    Given three points a,b,c,
+    returns the exact sign of triangle_area(a, b, c): -1 if a,b,c is a
+    clockwise sequence, 1 if it is counter-clockwise and 0 if the points are
+    collinear.
+
+    Integer coordinates go straight to the integer cross product. Other
+    coordinates are evaluated in floating point first, and only when the
+    result is within ORIENTATION_BOUND of zero is it recomputed exactly
+    in integers.
+    """
+    ax, ay = a
+    bx, by = b
+    cx, cy = c
+    left = (cx - bx) * (by - ay)
+    right = (bx - ax) * (cy - by)
+    # The products are ints exactly when all six coordinates are.
+    if type(left) is int and type(right) is int:
+        return (left > right) - (left < right)
+
+    area = left - right
+    if (type(ax) is float and type(ay) is float and type(bx) is float
+            and type(by) is float and type(cx) is float and type(cy) is float
+            or all(type(value) is not int or abs(value) <= FLOAT_EXACT_INT for value in (ax, ay, bx, by, cx, cy))):
+        if abs(area) > ORIENTATION_BOUND * (abs(left) + abs(right)):
+            return 1 if area > 0 else -1
+
+    # Exact fallback: scale every coordinate to an integer over a common
+    # denominator (a power of two for floats) and take the integer cross.
+    ratios = [value.as_integer_ratio() for value in (ax, ay, bx, by, cx, cy)]
+    scale = math.lcm(*(denominator for _, denominator in ratios))
+    ax, ay, bx, by, cx, cy = (numerator * (scale // denominator) for numerator, denominator in ratios)
+    area = (cx - bx) * (by - ay) - (bx - ax) * (cy - by)
+    return (area > 0) - (area < 0)
+
+
 def is_clockwise(a: Point, b: Point, c: Point) -> bool:
     """
     Given three points a,b,c,
     returns True if and only if a,b,c represents a clockwise sequence
-    (subject to floating-point precision)
+    (exactly, see orientation)
     """
-    return triangle_area(a, b, c) < -EPSILON
+    return orientation(a, b, c) < 0
 
 
 def is_counter_clockwise(a: Point, b: Point, c: Point) -> bool:
     """
     Given three points a,b,c,
     returns True if and only if a,b,c represents a counter-clockwise sequence
-    (subject to floating-point precision)
+    (exactly, see orientation)
     """
-    return triangle_area(a, b, c) > EPSILON
+    return orientation(a, b, c) > 0
 
 
 def collinear(a: Point, b: Point, c: Point) -> bool:
     """
     Given three points a,b,c,
     returns True if and only if a,b,c are collinear
-    (subject to floating-point precision)
+    (exactly, see orientation)
     """
-    return abs(triangle_area(a, b, c)) <= EPSILON
+    return orientation(a, b, c) == 0
 
 
 def sort_clockwise(points: List[Point]):
@@ -189,14 +275,17 @@ def point_checker(points, point1, point2):
     correct1 = True
     correct2 = True
 
+    # With the line running left to right, points above it are clockwise
+    # from it and points below are counter-clockwise.
+    low, high = sorted((point1, point2))
     for point in points :
         if point == point1 or point == point2:
             continue
-        y_int = y_intercept(point1, point2, point[0])
+        side = orientation(low, high, point)
 
-        if y_int < point[1]:
+        if side < 0:
             correct1 = False
-        elif y_int > point[1]:
+        elif side > 0:
             correct2 = False
     
     if correct1 or correct2:
@@ -218,15 +307,291 @@ def point_checker_for_equal_points(points, point2):
     else:
         return False
 
-def compute_hull(points: List[Point]) -> List[Point]:
+def monotone_chain_hull(points: List[Point]) -> List[Point]:
+    """
+    Given a list of points, computes the convex hull with Andrew's monotone
+    chain in O(n log n) and returns its vertices in the order of
+    sort_clockwise.
+
+    The points are sorted once by x then y, and the lower and upper chains
+    are each built in one pass that pops the last point while it does not
+    make a strict turn. Duplicates and points in the middle of a hull edge
+    are dropped, so only corners remain (both endpoints if every point is
+    collinear). Turns are tested with cross when every coordinate is an int
+    and with orientation otherwise, so no input hits a rounding error.
+    """
+    return chain_hull(sorted(set(points)))
+
+def chain_hull(points: List[Point]) -> List[Point]:
+    """
+    The body of monotone_chain_hull, for points that are already sorted and
+    distinct.
+    """
+    if len(points) < 3:
+        points = list(points)
+        sort_clockwise(points)
+        return points
+    turn = cross if all(type(x) is int and type(y) is int for x, y in points) else orientation
+
+    lower = []
+    for point in points:
+        while len(lower) >= 2 and turn(lower[-2], lower[-1], point) >= 0:
+            lower.pop()
+        lower.append(point)
+
+    upper = []
+    for point in reversed(points):
+        while len(upper) >= 2 and turn(upper[-2], upper[-1], point) >= 0:
+            upper.pop()
+        upper.append(point)
+
+    hull = lower[:-1] + upper[:-1]
+    sort_clockwise(hull)
+    return hull
+
+def akl_toussaint_filter(xs, ys):
+    """
+    Given the coordinate arrays of N points, returns the indices of the
+    points that are not strictly inside the octagon spanned by the extreme
+    points in x, y, x+y and x-y. Points inside it cannot be hull vertices,
+    and on most inputs that is nearly all of them.
+    """
+    extremes = set()
+    for values in (xs, ys, xs + ys, xs - ys):
+        extremes.add(int(numpy.argmin(values)))
+        extremes.add(int(numpy.argmax(values)))
+
+    corners = {(xs[index].item(), ys[index].item()): index for index in sorted(extremes)}
+    octagon = [corners[corner] for corner in monotone_chain_hull(list(corners))]
+    if len(octagon) < 3:
+        return numpy.arange(len(xs))
+
+    # sort_clockwise order keeps the inside on the negative side of cross
+    # for every edge of the octagon.
+    # Float crosses may be off by rounding, so a float point is only dropped
+    # when orientation's filter would find it certainly inside.
+    inside = numpy.ones(len(xs), dtype=bool)
+    for a, b in zip(octagon, octagon[1:] + octagon[:1]):
+        ax, ay, bx, by = xs[a], ys[a], xs[b], ys[b]
+        left = (xs - bx) * (by - ay)
+        right = (bx - ax) * (ys - by)
+        if xs.dtype.kind == "f":
+            inside &= left - right < -ORIENTATION_BOUND * (numpy.abs(left) + numpy.abs(right))
+        else:
+            inside &= left - right < 0
+    return numpy.flatnonzero(~inside)
+
+def exact_hull_indices(points, candidates) -> "numpy.ndarray":
+    """
+    hull_indices for the rows of points listed in candidates, worked out by
+    monotone_chain_hull on Python numbers. Repeated rows map to the first.
+    """
+    rows = [tuple(row) for row in points[candidates].tolist()]
+    index = {row: i for i, row in reversed(list(zip(candidates.tolist(), rows)))}
+    return numpy.array([index[row] for row in monotone_chain_hull(rows)], dtype=numpy.intp)
+
+def hull_indices(points) -> "numpy.ndarray":
+    """
+    Given an (N,2) numpy array of points, computes the convex hull and
+    returns the row indices of its vertices in the order of sort_clockwise
+    (one index per vertex when points repeat). Requires numpy.
+
+    Points inside the Akl-Toussaint octagon are dropped first. The rest go
+    through a quickhull that handles every open hull edge of a level in the
+    same array operations: each remaining point is tested against its own
+    edge, the farthest point outside each edge becomes a vertex, and the
+    points still outside are handed to the two edges that replace it.
+
+    Integer input is shifted to start at zero and worked on in int64, which
+    is exact while the x and y spans multiply to less than EXACT_LIMIT.
+    Wider integer input goes through monotone_chain_hull on Python ints.
+    Float crosses are not exact, so float input only gets the octagon
+    filter, and the points it keeps go through monotone_chain_hull, which
+    finds the same vertices as for a list of the points.
+    """
+    points = original = numpy.asarray(points)
+    if len(points) == 0:
+        return numpy.empty(0, dtype=numpy.intp)
+
+    if points.dtype.kind in "iu":
+        low = points.min(axis=0)
+        high = points.max(axis=0)
+        span_x = int(high[0]) - int(low[0])
+        span_y = int(high[1]) - int(low[1])
+        if max(span_x, span_y) >= EXACT_LIMIT or span_x * span_y >= EXACT_LIMIT:
+            return exact_hull_indices(points, numpy.arange(len(points)))
+        points = (points - low).astype(numpy.int64)
+
+    xs = numpy.ascontiguousarray(points[:, 0])
+    ys = numpy.ascontiguousarray(points[:, 1])
+
+    candidates = akl_toussaint_filter(xs, ys)
+    if points.dtype.kind not in "iu":
+        return exact_hull_indices(points, candidates)
+    order = numpy.lexsort((ys[candidates], xs[candidates]))
+    first, last = int(candidates[order[0]]), int(candidates[order[-1]])
+    if xs[first] == xs[last] and ys[first] == ys[last]:
+        return numpy.array([first], dtype=numpy.intp)
+    vertices = [numpy.array([first, last])]
+
+    # Edge 0 runs first -> last along the top and edge 1 comes back along the
+    # bottom. Points outside an edge have a negative cross.
+    edge_start = numpy.array([first, last])
+    edge_end = numpy.array([last, first])
+    point_x, point_y = xs[candidates], ys[candidates]
+    edges = numpy.zeros(len(candidates), dtype=numpy.intp)
+
+    while len(candidates):
+        ax, ay = xs[edge_start][edges], ys[edge_start][edges]
+        bx, by = xs[edge_end][edges], ys[edge_end][edges]
+        distance = (bx - ax) * (point_y - by) - (point_x - bx) * (by - ay)
+        if len(vertices) == 1:
+            # Points below the first edge are outside the second one.
+            edges = numpy.where(distance > 0, 0, 1)
+            distance = numpy.abs(distance)
+
+        outside = distance > 0
+        candidates, edges, distance = candidates[outside], edges[outside], distance[outside]
+        point_x, point_y = point_x[outside], point_y[outside]
+        if not len(candidates):
+            break
+
+        # The farthest point outside each edge, found without sorting. Ties
+        # lie on a line parallel to the edge, and only the ends of that run
+        # are vertices, so the largest (x, y) among them wins.
+        farthest_distance = numpy.zeros(len(edge_start), dtype=distance.dtype)
+        numpy.maximum.at(farthest_distance, edges, distance)
+        tied = distance == farthest_distance[edges]
+        tied_edges, tied_points = edges[tied], candidates[tied]
+        for coordinates in (xs, ys):
+            values = coordinates[tied_points]
+            best = numpy.full(len(edge_start), values.min())
+            numpy.maximum.at(best, tied_edges, values)
+            keep = values == best[tied_edges]
+            tied_edges, tied_points = tied_edges[keep], tied_points[keep]
+        winners = numpy.zeros(len(edge_start), dtype=numpy.intp)
+        winners[tied_edges] = tied_points
+        split_edges = numpy.flatnonzero(farthest_distance > 0)
+        farthest = winners[split_edges]
+        vertices.append(farthest)
+
+        # Edge k of the next level is (start, farthest) of the k-th split edge
+        # and edge k + len(farthest) is (farthest, end).
+        slots = numpy.zeros(len(edge_start), dtype=numpy.intp)
+        slots[split_edges] = numpy.arange(len(split_edges))
+        slot = slots[edges]
+        starts = edge_start[split_edges]
+        ax, ay = xs[starts][slot], ys[starts][slot]
+        fx, fy = xs[farthest][slot], ys[farthest][slot]
+        before = (point_x - fx) * (fy - ay) - (fx - ax) * (point_y - fy) < 0
+        edges = numpy.where(before, slot, slot + len(farthest))
+        edge_start = numpy.concatenate((starts, farthest))
+        edge_end = numpy.concatenate((farthest, edge_end[split_edges]))
+
+    hull = numpy.concatenate(vertices)
+    hull_x, hull_y = original[hull, 0], original[hull, 1]
+    centroid_x = sum(hull_x.tolist()) / len(hull)
+    centroid_y = sum(hull_y.tolist()) / len(hull)
+    angles = (numpy.arctan2(hull_y - centroid_y, hull_x - centroid_x) + math.tau) % math.tau
+    return hull[numpy.lexsort((hull_y, hull_x, angles))]
+
+def attach_shared_points(name: str, typecode: str):
+    """ Pool initializer: attaches a worker to the coordinates written by parallel_hull. """
+    global shared_points
+    shared_points = (shared_memory.SharedMemory(name=name), typecode)
+
+def shard_hull(start: int, end: int) -> List[Point]:
+    """
+    Computes the hull of points start to end - 1 of the shared x-sorted
+    array, which holds x and y of each point one after the other.
+    """
+    memory, typecode = shared_points
+    coordinates = memory.buf.cast(typecode)
+    shard = list(zip(coordinates[2 * start:2 * end:2], coordinates[2 * start + 1:2 * end:2]))
+    coordinates.release()
+    return chain_hull(shard)
+
+def parallel_hull(points: List[Point], workers: int = None) -> List[Point]:
+    """
+    Given a list of points, computes the convex hull on a pool of processes
+    and returns its vertices in the order of sort_clockwise.
+
+    The points are sorted once and copied into shared memory, so workers
+    read their shard in place instead of receiving a pickled slice. Shards
+    never split a run of equal x values. Each worker returns the hull of its
+    shard, and neighbouring hulls are then merged in pairs with
+    merge_tangents, one level of the reduction tree at a time, until one is
+    left.
+
+    Inputs below PARALLEL_MIN_POINTS, and coordinates that fit neither int64
+    nor float, go through monotone_chain_hull instead.
+    """
+    points = sorted(set(points))
+    if len(points) < PARALLEL_MIN_POINTS:
+        return chain_hull(points)
+
+    coordinates = list(chain.from_iterable(points))
+    if all(type(value) is int for value in coordinates):
+        if not (-(1 << 63) <= min(coordinates) and max(coordinates) < 1 << 63):
+            return chain_hull(points)
+        typecode = 'q'
+    elif all(type(value) is float for value in coordinates):
+        typecode = 'd'
+    else:
+        return chain_hull(points)
+    coordinates = array(typecode, coordinates)
+
+    workers = workers or os.cpu_count() or 1
+    shards = workers * SHARDS_PER_WORKER
+    bounds = [0]
+    for shard in range(1, shards):
+        bound = max(len(points) * shard // shards, bounds[-1])
+        while 0 < bound < len(points) and points[bound][0] == points[bound - 1][0]:
+            bound += 1
+        if bounds[-1] < bound < len(points):
+            bounds.append(bound)
+    bounds.append(len(points))
+
+    memory = shared_memory.SharedMemory(create=True, size=len(coordinates) * coordinates.itemsize)
+    try:
+        memory.buf[:len(coordinates) * coordinates.itemsize] = memoryview(coordinates).cast('B')
+        with ProcessPoolExecutor(workers, initializer=attach_shared_points,
+                                 initargs=(memory.name, typecode)) as executor:
+            hulls = list(executor.map(shard_hull, bounds[:-1], bounds[1:]))
+            while len(hulls) > 1:
+                merged = list(executor.map(merge_tangents, hulls[0::2], hulls[1::2]))
+                if len(hulls) % 2:
+                    merged.append(hulls[-1])
+                hulls = merged
+    finally:
+        memory.close()
+        memory.unlink()
+
+    # The tangent walks keep points that are collinear with a tangent, so the
+    # last pass drops those and puts the vertices in sort_clockwise order.
+    return monotone_chain_hull(hulls[0])
+
+def compute_hull(points: List[Point], engine: str = "divide") -> List[Point]:
     """
     Given a list of points, computes the convex hull around those points
     and returns only the points that are on the hull.
+
+    engine picks the algorithm: "divide" is the divide and conquer below,
+    "monotone" is monotone_chain_hull and "parallel" is parallel_hull.
     """
+    if engine not in HULL_ENGINES:
+        raise ValueError(f"unknown engine {engine!r}, expected one of {HULL_ENGINES}")
+    if engine == "monotone":
+        return monotone_chain_hull(points)
+    if engine == "parallel":
+        return parallel_hull(points)
+
+    # The base case takes a repeated point for an extreme one, so divide
+    # only ever sees distinct points.
+    points = sorted(set(points))
     if len(points) < 7:
         return base_case_hull(points)
-    
-    points.sort()
+
     hull = divide(points)
 
     return hull
@@ -241,7 +606,7 @@ def divide(points: List[Point]):
         midpoint += 1
         if midpoint == (len(points) - 1):
             return base_case_hull(points)
-            left = divide(points[0:midpoint + 1])
+    left = divide(points[0:midpoint + 1])
     right = divide(points[midpoint + 1:])
 
     hull = merge_hulls(left, right)
@@ -261,6 +626,20 @@ def is_colinear(points):
 
     return True
 
+def pushes_tangent(left_end: Point, right_end: Point, candidate: Point, turn: int, moving_left: bool) -> bool:
+    """
+    Given a tangent left_end->right_end between two hulls, returns True if
+    replacing one of its ends (the left one if moving_left) with candidate
+    pushes it outward: candidate makes the given turn (1 or -1, as returned
+    by orientation) with the tangent, or lies on its line past the moving end.
+    """
+    side = orientation(left_end, right_end, candidate)
+    if side != 0:
+        return side == turn
+    fixed, moving = (right_end, left_end) if moving_left else (left_end, right_end)
+    axis = 0 if moving[0] != fixed[0] else 1
+    return candidate[axis] != moving[axis] and (moving[axis] > fixed[axis]) == (candidate[axis] > moving[axis])
+
 def merge_hulls(left: List[Point], right: List[Point]) -> List[Point]:
     """
     Function to find the upper and lower tangents, then merge.
@@ -271,22 +650,33 @@ def merge_hulls(left: List[Point], right: List[Point]) -> List[Point]:
 
     if is_colinear(left) or is_colinear(right):
         return base_case_hull(left + right)
-        i = left.index(max(left))
+    return merge_tangents(left, right)
+
+def merge_tangents(left: List[Point], right: List[Point]) -> List[Point]:
+    """
+    Given two hulls in the same rotational order, with every point of left
+    to the left of every point of right, walks the upper and lower tangents
+    and joins the two hulls along them.
+    """
+    i = left.index(max(left))
     j = right.index(min(right))
     k = i
     l = j
-    
-    middle = (left[i][0] + right[j][0]) / 2
+
+    # Every left point lies left of every right point, so moving one end of
+    # the tangent lowers its intercept with the vertical line between the
+    # hulls exactly when the new point is counter-clockwise from the current
+    # tangent. A point on the tangent's line is taken too when it lies
+    # further out, so the tangent ends at the outermost of collinear points.
+    # Each step improves the tangent or lengthens it, so the walks end.
 
     # Finds the upper tangent.
     upper = [left[i], right[j]]
     while(True):
-        y_int = y_intercept(upper[0], upper[1], middle)
-
-        if y_intercept(left[(i - 1) % len(left)], upper[1], middle) < y_int:
+        if pushes_tangent(upper[0], upper[1], left[(i - 1) % len(left)], 1, True):
             i -= 1
             upper[0] = left[i%len(left)]
-        elif y_intercept(upper[0], right[(j + 1) % len(right)], middle) < y_int:
+        elif pushes_tangent(upper[0], upper[1], right[(j + 1) % len(right)], 1, False):
             j += 1
             upper[1] = right[j % len(right)]
         else:
@@ -295,12 +685,10 @@ def merge_hulls(left: List[Point], right: List[Point]) -> List[Point]:
     # Finds the lower tangent.
     lower = [left[k], right[l]]
     while(True):
-        y_int = y_intercept(lower[0], lower[1], middle)
-
-        if y_intercept(left[(k + 1) % len(left)], lower[1], middle) > y_int:
+        if pushes_tangent(lower[0], lower[1], left[(k + 1) % len(left)], -1, True):
             k += 1
             lower[0] = left[k % len(left)]
-        elif y_intercept(lower[0], right[(l - 1) % len(right)], middle) > y_int:
+        elif pushes_tangent(lower[0], lower[1], right[(l - 1) % len(right)], -1, False):
             l -= 1
             lower[1] = right[l % len(right)]
         else:
@@ -323,3 +711,192 @@ def merge_hulls(left: List[Point], right: List[Point]) -> List[Point]:
         counter2 += 1
      
     return hull
+
+def chain_section(points: List[Point], side: int) -> List[Point]:
+    """
+    Given sorted, distinct points, returns the lower (side -1) or upper
+    (side 1) chain of their hull from the first point to the last. Every
+    vertex in between turns the given way, as returned by orientation.
+    """
+    section = []
+    for point in points:
+        while len(section) >= 2 and orientation(section[-2], section[-1], point) != side:
+            section.pop()
+        section.append(point)
+    return section
+
+class DynamicHull:
+    """
+    The convex hull of a set of points that changes one point at a time.
+
+    The hull is kept as its lower and upper chains, each a list of vertices
+    sorted by (x, y) from the leftmost point to the rightmost, next to a
+    sorted list of every distinct point in the set. Inserting a point only
+    touches the chains next to it: a binary search finds where it goes and
+    any vertices it hides are popped, which is O(log n) amortized, on top of
+    the list insertions. Deleting a point that is not a chain vertex only
+    updates the point list. Deleting a vertex rebuilds its chain between the
+    vertex's two neighbours, which are still on the hull, from the points
+    lying between them, so it costs O(log n + k) for the k points in that
+    slice. contains, extreme and tangents binary search the chains in
+    O(log h) for h hull vertices.
+    """
+
+    def __init__(self, points: List[Point] = ()):
+        self.counts = {}
+        for point in points:
+            self.counts[point] = self.counts.get(point, 0) + 1
+        self.points = sorted(self.counts)
+        self.lower = chain_section(self.points, -1)
+        self.upper = chain_section(self.points, 1)
+
+    def __len__(self) -> int:
+        return sum(self.counts.values())
+
+    def hull(self) -> List[Point]:
+        """
+        Returns the hull's vertices in the same order as compute_hull.
+        """
+        hull = self.lower[:-1] + self.upper[:0:-1]
+        if len(self.points) < 3:
+            hull = list(self.points)
+        sort_clockwise(hull)
+        return hull
+
+    def insert(self, point: Point):
+        count = self.counts.get(point, 0)
+        self.counts[point] = count + 1
+        if count:
+            return
+        self.points.insert(bisect_left(self.points, point), point)
+        for hull_chain, side in ((self.lower, -1), (self.upper, 1)):
+            i = bisect_left(hull_chain, point)
+            if 0 < i < len(hull_chain) and orientation(hull_chain[i - 1], point, hull_chain[i]) != side:
+                continue
+            hull_chain.insert(i, point)
+            while i >= 2 and orientation(hull_chain[i - 2], hull_chain[i - 1], point) != side:
+                del hull_chain[i - 1]
+                i -= 1
+            while i + 2 < len(hull_chain) and orientation(point, hull_chain[i + 1], hull_chain[i + 2]) != side:
+                del hull_chain[i + 1]
+
+    def delete(self, point: Point):
+        """
+        Removes one copy of point. Raises ValueError if it is not in the set.
+        """
+        count = self.counts.get(point, 0)
+        if not count:
+            raise ValueError(f"{point!r} is not in the hull's point set")
+        if count > 1:
+            self.counts[point] = count - 1
+            return
+        del self.counts[point]
+        del self.points[bisect_left(self.points, point)]
+        for hull_chain, side in ((self.lower, -1), (self.upper, 1)):
+            i = bisect_left(hull_chain, point)
+            if i == len(hull_chain) or hull_chain[i] != point:
+                continue
+            if not self.points:
+                hull_chain.clear()
+                continue
+            start = bisect_left(self.points, hull_chain[i - 1]) if i > 0 else 0
+            end = bisect_right(self.points, hull_chain[i + 1]) if i + 1 < len(hull_chain) else len(self.points)
+            hull_chain[max(i - 1, 0):i + 2] = chain_section(self.points[start:end], side)
+
+    def contains(self, point: Point) -> bool:
+        """
+        Returns True if point is inside the hull or on its boundary.
+        """
+        if not self.points:
+            return False
+        lower, upper = self.lower, self.upper
+        x, y = point
+        first, last = lower[0], lower[-1]
+        if x < first[0] or x > last[0]:
+            return False
+        # The chains meet the vertical lines through the first and last
+        # points in a segment, not an edge crossing.
+        if x == first[0]:
+            top = upper[1][1] if len(upper) > 1 and upper[1][0] == x else first[1]
+            return first[1] <= y <= top
+        if x == last[0]:
+            bottom = lower[-2][1] if len(lower) > 1 and lower[-2][0] == x else last[1]
+            return bottom <= y <= last[1]
+        i = bisect_right(lower, (x, math.inf))
+        j = bisect_right(upper, (x, math.inf))
+        return orientation(lower[i - 1], lower[i], point) <= 0 and orientation(upper[j - 1], upper[j], point) >= 0
+
+    def extreme(self, direction: Point) -> Point:
+        """
+        Returns a hull vertex furthest along direction, a nonzero vector.
+        """
+        if not self.points:
+            raise ValueError("the hull is empty")
+        dx, dy = direction
+        if dy == 0:
+            if dx == 0:
+                raise ValueError("direction must be a nonzero vector")
+            return self.lower[-1] if dx > 0 else self.lower[0]
+        # Along the hull_chain that faces direction, the edges first move along
+        # it and then against it, so the extreme vertex ends the first run.
+        hull_chain = self.upper if dy > 0 else self.lower
+        low, high = 0, len(hull_chain) - 1
+        while low < high:
+            middle = (low + high) // 2
+            a, b = hull_chain[middle], hull_chain[middle + 1]
+            if dx * (b[0] - a[0]) + dy * (b[1] - a[1]) > 0:
+                low = middle + 1
+            else:
+                high = middle
+        return hull_chain[low]
+
+    def tangents(self, point: Point) -> Optional[Tuple[Point, Point]]:
+        """
+        Returns the two hull vertices whose lines through point touch the
+        hull, ordered so that point and the two make a clockwise turn (or
+        none, for a degenerate hull in line with point). Returns None if
+        point is inside the hull or on its boundary.
+        """
+        if self.contains(point):
+            return None
+        if len(self.points) == 1:
+            return self.points[0], self.points[0]
+        lower, upper = self.lower, self.upper
+        x = point[0]
+        if x < lower[0][0]:
+            # The edges seen from the left start both chains.
+            first = lower[self.first_edge(lower, -1, point, 0, len(lower) - 1, False)]
+            second = upper[self.first_edge(upper, 1, point, 0, len(upper) - 1, False)]
+        elif x > lower[-1][0]:
+            # The edges seen from the right end both chains.
+            first = lower[self.first_edge(lower, -1, point, 0, len(lower) - 1, True)]
+            second = upper[self.first_edge(upper, 1, point, 0, len(upper) - 1, True)]
+        else:
+            # Above or below the hull only the edges of one hull_chain are seen,
+            # and they run either way from the edge under or over point.
+            hull_chain, side = upper, 1
+            middle = min(bisect_right(upper, (x, math.inf)), len(upper) - 1) - 1
+            if orientation(upper[middle], upper[middle + 1], point) != -side:
+                hull_chain, side = lower, -1
+                middle = max(bisect_left(lower, (x, -math.inf)), 1) - 1
+            first = hull_chain[self.first_edge(hull_chain, side, point, 0, middle, True)]
+            second = hull_chain[self.first_edge(hull_chain, side, point, middle, len(hull_chain) - 1, False)]
+        if orientation(point, first, second) > 0:
+            first, second = second, first
+        return first, second
+
+    @staticmethod
+    def first_edge(hull_chain: List[Point], side: int, point: Point, low: int, high: int, seen: bool) -> int:
+        """
+        Given that the edges hull_chain[i]->hull_chain[i + 1] for i in [low, high) that
+        point sees from outside the hull form a suffix (seen) or a prefix (not
+        seen) of that range, returns the index of the first edge in it whose
+        visibility equals seen, or high if there is none.
+        """
+        while low < high:
+            middle = (low + high) // 2
+            if (orientation(hull_chain[middle], hull_chain[middle + 1], point) == -side) == seen:
+                high = middle
+            else:
+                low = middle + 1
+        return low
@@ -0,0 +1,251 @@
+import random
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+from collections import deque
+
+import rubik
+import solver
+
+"""
+Benchmarks for solver.py.
+
+Usage: python benchmark.py [scrambles_per_depth]
+
+For every depth from 1 to MAX_SCRAMBLE, builds random scrambles by applying
+that many quarter twists to the solved cube, then times shortest_path from
+each scramble back to rubik.I. The original solver (list membership for the
+visited states and a pairwise scan of both frontiers) is kept below as
+legacy_shortest_path and is timed on the same scrambles up to LEGACY_DEPTH.
+
+Afterwards the memory held per visited state is measured with tracemalloc
+for a BFS from the solved cube out to MEMORY_DEPTH, once with the visited map
+keyed by 24-tuples (holding (move, parent) tuples) and once keyed by encoded
+positions (holding move indices).
+
+Finally the distance table is built into a temporary file, and its build
+time, size and load time are reported. Per query latency of the "table"
+engine is then compared with the "bfs" engine on TABLE_QUERIES scrambles of
+SCRAMBLE_LENGTH random twists.
+
+The "bfs" and "ida" engines are then compared on ENGINE_QUERIES such
+scrambles by time and by the mean number of states each one expanded and
+held in memory.
+
+Last, solve_many is timed on BATCH_QUERIES scrambles with the "bfs" engine
+for 1, 2, 4, ... workers up to the number of CPUs, against calling
+shortest_path once per query.
+"""
+
+MAX_SCRAMBLE = 7
+LEGACY_DEPTH = 7
+MEMORY_DEPTH = 8
+TABLE_QUERIES = 200
+SCRAMBLE_LENGTH = 30
+ENGINE_QUERIES = 50
+BATCH_QUERIES = 400
+
+
+class legacy_node:
+    def __init__(self, state, parent, order):
+        self.state = state
+        self.parent = parent
+        self.order = order
+
+
+def legacy_next_frontier(frontier, nodes):
+    start = frontier[0].order
+    while start == frontier[0].order:
+        current = frontier.popleft()
+        for move in rubik.quarter_twists:
+            move_state = rubik.perm_apply(move, current.state)
+            if move_state not in nodes:
+                frontier.append(legacy_node(move_state, (move, current), current.order + 1))
+                nodes.append(move_state)
+
+
+def legacy_shortest_path(start, end):
+    """ The original two-way BFS: visited lists and an O(|F1| * |F2|) meeting check. """
+    start_frontier = deque([legacy_node(start, (None, None), 0)])
+    start_nodes = []
+    end_frontier = deque([legacy_node(end, (None, None), 0)])
+    end_nodes = []
+    if start == end:
+        return []
+    flag = 1
+    intersection = None
+    while intersection is None:
+        if start_frontier[0].order > 6 and end_frontier[0].order > 6:
+            return None
+        if flag == 1:
+            legacy_next_frontier(start_frontier, start_nodes)
+        else:
+            legacy_next_frontier(end_frontier, end_nodes)
+        flag = flag * (-1)
+        for left in start_frontier:
+            for right in end_frontier:
+                if left.state == right.state:
+                    intersection = (left, right)
+                    break
+            if intersection is not None:
+                break
+    solution = []
+    left = intersection[0]
+    while left.state != start:
+        solution.insert(0, left.parent[0])
+        left = left.parent[1]
+    right = intersection[1]
+    while right.state != end:
+        solution.append(rubik.perm_inverse(right.parent[0]))
+        right = right.parent[1]
+    return solution
+
+
+def scramble(depth: int, rng: random.Random):
+    """ Applies depth random quarter twists to the solved cube. """
+    state = rubik.I
+    for _ in range(depth):
+        state = rubik.perm_apply(rng.choice(rubik.quarter_twists), state)
+    return state
+
+
+def check(start, path):
+    """ Makes sure path takes start back to the solved cube. """
+    state = start
+    for move in path:
+        state = rubik.perm_apply(move, state)
+    assert state == rubik.I
+
+
+def timed(function, scrambles):
+    start = time.perf_counter()
+    paths = [function(state, rubik.I) for state in scrambles]
+    return time.perf_counter() - start, paths
+
+
+def bench(depth: int, count: int):
+    rng = random.Random(440 + depth)
+    scrambles = [scramble(depth, rng) for _ in range(count)]
+
+    elapsed, paths = timed(solver.shortest_path, scrambles)
+    for state, path in zip(scrambles, paths):
+        check(state, path)
+    print(f"depth {depth}: shortest_path {elapsed / count:.6f}s per query "
+          f"(mean length {sum(map(len, paths)) / count:.2f})")
+
+    if depth <= LEGACY_DEPTH:
+        legacy_elapsed, legacy_paths = timed(legacy_shortest_path, scrambles)
+        assert list(map(len, legacy_paths)) == list(map(len, paths))
+        print(f"depth {depth}: legacy        {legacy_elapsed / count:.6f}s per query "
+              f"({legacy_elapsed / elapsed:.1f}x)")
+
+
+def tuple_visited(depth: int):
+    """ BFS to depth with 24-tuple states, as the solver stored them before encoding. """
+    parents = {rubik.I: None}
+    frontier = [rubik.I]
+    for _ in range(depth):
+        next_frontier = []
+        for state in frontier:
+            for move in rubik.quarter_twists:
+                move_state = rubik.perm_apply(move, state)
+                if move_state not in parents:
+                    parents[move_state] = (move, state)
+                    next_frontier.append(move_state)
+        frontier = next_frontier
+    return parents
+
+
+def encoded_visited(depth: int):
+    """ BFS to depth over encoded positions, the way solver.find_next_frontier stores them. """
+    parents = {solver.SOLVED: None}
+    frontier = [solver.SOLVED]
+    for _ in range(depth):
+        frontier, _ = solver.find_next_frontier(frontier, parents, ())
+    return parents
+
+
+def bench_memory(depth: int):
+    for name, visit in (("24-tuple", tuple_visited), ("encoded", encoded_visited)):
+        tracemalloc.start()
+        parents = visit(depth)
+        size = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+        print(f"visited to depth {depth}: {name:8} {size / len(parents):.1f} bytes per state "
+              f"({len(parents)} states)")
+        del parents
+
+
+def bench_table(count: int):
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "distances.bin")
+
+        start = time.perf_counter()
+        solver.build_distance_table(path)
+        print(f"distance table: built in {time.perf_counter() - start:.1f}s, "
+              f"{os.path.getsize(path)} bytes for {solver.STATE_COUNT} positions")
+
+        start = time.perf_counter()
+        solver.distance_table = solver.load_distance_table(path)
+        print(f"distance table: loaded in {time.perf_counter() - start:.6f}s")
+
+        rng = random.Random(440)
+        scrambles = [scramble(SCRAMBLE_LENGTH, rng) for _ in range(count)]
+        for engine in ("table", "bfs"):
+            elapsed, paths = timed(lambda state, end: solver.shortest_path(state, end, engine), scrambles)
+            for state, path in zip(scrambles, paths):
+                check(state, path)
+            print(f"scramble {SCRAMBLE_LENGTH}: {engine:5} engine {elapsed / count:.6f}s per query "
+                  f"(mean length {sum(map(len, paths)) / count:.2f})")
+
+        solver.distance_table.release()
+        solver.distance_table = None
+
+
+def bench_engines(count: int):
+    rng = random.Random(440)
+    scrambles = [scramble(SCRAMBLE_LENGTH, rng) for _ in range(count)]
+    for engine in ("bfs", "ida"):
+        expanded = stored = 0
+        start = time.perf_counter()
+        for state in scrambles:
+            stats = {}
+            path = solver.shortest_path(state, rubik.I, engine, stats)
+            check(state, path)
+            expanded += stats["nodes_expanded"]
+            stored += stats["nodes_stored"]
+        elapsed = time.perf_counter() - start
+        print(f"scramble {SCRAMBLE_LENGTH}: {engine:3} engine {elapsed / count:.6f}s per query, "
+              f"{expanded / count:.0f} nodes expanded, {stored / count:.0f} stored")
+
+
+def bench_many(count: int):
+    rng = random.Random(440)
+    pairs = [(scramble(SCRAMBLE_LENGTH, rng), rubik.I) for _ in range(count)]
+    distinct = len({solver.canonical_offset(start)[0] for start, _ in pairs})
+
+    elapsed, paths = timed(solver.shortest_path, [start for start, _ in pairs])
+    print(f"batch of {count} ({distinct} distinct up to symmetry): "
+          f"shortest_path loop {count / elapsed:.0f} queries/s")
+
+    workers = 1
+    while workers <= (os.cpu_count() or 1):
+        start = time.perf_counter()
+        batch = list(solver.solve_many(pairs, workers))
+        batch_elapsed = time.perf_counter() - start
+        assert list(map(len, batch)) == list(map(len, paths))
+        print(f"batch of {count}: solve_many with {workers} workers {count / batch_elapsed:.0f} queries/s "
+              f"({elapsed / batch_elapsed:.1f}x)")
+        workers *= 2
+
+
+if __name__ == "__main__":
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    for depth in range(1, MAX_SCRAMBLE + 1):
+        bench(depth, count)
+    bench_memory(MEMORY_DEPTH)
+    bench_table(TABLE_QUERIES)
+    bench_engines(ENGINE_QUERIES)
+    bench_many(BATCH_QUERIES)
@@ -2,13 +2,20 @@
 # it in a .pdf file titled extra_credit.pdf
 
 # Imports.
+import mmap
+import os
+import struct
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+from itertools import permutations
+from itertools import product
+from itertools import repeat
 from typing import List
 from typing import Optional
 from rubik import perm_apply, perm_inverse
 
 import rubik
 import heapq
-from collections import deque
 
 '''
 Invariant Documentation:
@@ -48,107 +55,620 @@ Termination: If it finds a path from start to end, then it returns the
              true either way. 
 '''      
 
-# Class to store the state of the node.
-class node_info:
-    def __init__(self, state, parent, order):
-        self.state = state
-        self.parent = parent
-        self.order = order
+# Maximum number of levels each side of the search explores. Together the two
+# sides cover the 14 quarter turns any 2x2x2 position needs at most.
+MAX_DEPTH = 7
+
+# Compact state encoding.
+#
+# Stickers 3k, 3k + 1 and 3k + 2 of a position belong to corner location k, in
+# cyclic order, so a location is described by the cubie sitting there
+# (position[3k] // 3) and how far it is twisted (position[3k] % 3). The one
+# corner no quarter twist moves always stays home. The other seven give a
+# permutation rank below 7! and the twists of the first six give a base 3
+# number below 3^6 (the seventh twist follows, since the twists of a reachable
+# position always add up to a multiple of 3). A position is stored as
+# permutation rank * TWIST_COUNT + twist rank, a single int below STATE_COUNT.
+CORNERS = 8
+FIXED_CORNER = next(corner for corner in range(CORNERS)
+                    if all(move[3 * corner] == 3 * corner for move in rubik.quarter_twists))
+MOVING_CORNERS = [corner for corner in range(CORNERS) if corner != FIXED_CORNER]
+PERMUTATION_COUNT = 5040
+TWIST_COUNT = 729
+STATE_COUNT = PERMUTATION_COUNT * TWIST_COUNT
+
+# Each quarter twist as seen by the moving corners: for every location, the
+# location whose cubie it receives and the twist it adds.
+CORNER_MOVES = [[(MOVING_CORNERS.index(move[3 * corner] // 3), move[3 * corner] % 3)
+                 for corner in MOVING_CORNERS]
+                for move in rubik.quarter_twists]
+
+# Index in rubik.quarter_twists of the inverse of every quarter twist.
+INVERSE_MOVES = [rubik.quarter_twists.index(perm_inverse(move)) for move in rubik.quarter_twists]
+
+
+def rank_permutation(cubies):
+    """ Returns the Lehmer rank of a permutation of range(len(cubies)). """
+    rank = 0
+    for i, cubie in enumerate(cubies):
+        smaller = 0
+        for later in cubies[i + 1:]:
+            if later < cubie:
+                smaller += 1
+        rank = rank * (len(cubies) - i) + smaller
+    return rank
+
+
+def unrank_permutation(rank, size=len(MOVING_CORNERS)):
+    """ Inverse of rank_permutation. """
+    digits = []
+    for base in range(1, size + 1):
+        rank, digit = divmod(rank, base)
+        digits.append(digit)
+    remaining = list(range(size))
+    return [remaining.pop(digit) for digit in reversed(digits)]
+
+
+def rank_twists(twists):
+    """ Returns the base 3 number formed by all but the last twist. """
+    rank = 0
+    for twist in twists[:-1]:
+        rank = rank * 3 + twist
+    return rank
+
+
+def unrank_twists(rank):
+    """ Inverse of rank_twists; the last twist makes the total a multiple of 3. """
+    twists = []
+    for _ in range(len(MOVING_CORNERS) - 1):
+        rank, twist = divmod(rank, 3)
+        twists.append(twist)
+    twists.reverse()
+    twists.append(-sum(twists) % 3)
+    return twists
+
+
+def encode(state) -> Optional[int]:
+    """
+    Packs a 24-sticker position into an int below STATE_COUNT. Returns None
+    if the position cannot be reached from rubik.I with quarter twists.
+    """
+    home = 3 * FIXED_CORNER
+    if tuple(state[home:home + 3]) != (home, home + 1, home + 2):
+        return None
+
+    cubies = []
+    twists = []
+    for corner in MOVING_CORNERS:
+        cubie, twist = divmod(state[3 * corner], 3)
+        # The three stickers of a location must be one cubie in cyclic order.
+        for offset in (1, 2):
+            if state[3 * corner + offset] != 3 * cubie + (twist + offset) % 3:
+                return None
+        if cubie == FIXED_CORNER:
+            return None
+        cubies.append(MOVING_CORNERS.index(cubie))
+        twists.append(twist)
+    if sum(twists) % 3:
+        return None
+
+    return rank_permutation(cubies) * TWIST_COUNT + rank_twists(twists)
+
+
+def decode(code: int):
+    """ Inverse of encode: rebuilds the 24-sticker position. """
+    permutation, twist = divmod(code, TWIST_COUNT)
+    state = list(range(3 * CORNERS))
+    for corner, cubie, twist in zip(MOVING_CORNERS, unrank_permutation(permutation), unrank_twists(twist)):
+        cubie = MOVING_CORNERS[cubie]
+        for offset in range(3):
+            state[3 * corner + offset] = 3 * cubie + (twist + offset) % 3
+    return tuple(state)
+
+
+def build_move_tables():
+    """
+    Returns, for every quarter twist, the new permutation rank of each
+    permutation rank and the new twist rank of each twist rank. The two parts
+    of an encoded position move independently, so 6 * (5040 + 729) entries
+    replace perm_apply on whole positions.
+    """
+    tables = []
+    for corner_move in CORNER_MOVES:
+        permutation_moves = array('H', bytes(2 * PERMUTATION_COUNT))
+        for rank in range(PERMUTATION_COUNT):
+            cubies = unrank_permutation(rank)
+            permutation_moves[rank] = rank_permutation([cubies[source] for source, _ in corner_move])
+
+        twist_moves = array('H', bytes(2 * TWIST_COUNT))
+        for rank in range(TWIST_COUNT):
+            twists = unrank_twists(rank)
+            twist_moves[rank] = rank_twists([(twists[source] + twist) % 3 for source, twist in corner_move])
+
+        tables.append((permutation_moves, twist_moves))
+    return tables
+
+
+MOVE_TABLES = build_move_tables()
+SOLVED = encode(rubik.I)
+
+# Distance table: for every encoded position, its distance from the solved
+# cube modulo 3 in 2 bits, four positions per byte (3 marks a position the
+# build has not reached yet). The file holds a header (signature, format
+# version, number of positions) followed by the packed table.
+DISTANCE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "distances.bin")
+DISTANCE_MAGIC = b"RDIS"
+DISTANCE_VERSION = 1
+DISTANCE_HEADER = struct.Struct(">4sBI")
+distance_table = None
+
+# Search engines accepted by shortest_path.
+ENGINES = ("bfs", "table", "ida")
+
+# Number of distinct queries handed to a worker at a time by solve_many.
+SOLVE_CHUNK_SIZE = 64
+
+
+def build_pattern_database(part: int, count: int) -> bytearray:
+    """
+    Returns the distance from solved of every rank of one part of an encoded
+    position, ignoring the other part (part 0 is the permutation rank, part 1
+    the twist rank). Solving the whole cube solves each part, so both are
+    lower bounds on the full distance.
+    """
+    solved = divmod(SOLVED, TWIST_COUNT)[part]
+    distances = bytearray(b"\xff") * count
+    distances[solved] = 0
+    frontier = [solved]
+    depth = 0
+    while frontier:
+        depth += 1
+        next_frontier = []
+        for rank in frontier:
+            for tables in MOVE_TABLES:
+                move_rank = tables[part][rank]
+                if distances[move_rank] == 0xff:
+                    distances[move_rank] = depth
+                    next_frontier.append(move_rank)
+        frontier = next_frontier
+    return distances
+
+
+PERMUTATION_DISTANCES = build_pattern_database(0, PERMUTATION_COUNT)
+TWIST_DISTANCES = build_pattern_database(1, TWIST_COUNT)
+
+
+def apply_move(code: int, move: int) -> int:
+    """ Applies rubik.quarter_twists[move] to an encoded position. """
+    permutation_moves, twist_moves = MOVE_TABLES[move]
+    permutation, twist = divmod(code, TWIST_COUNT)
+    return permutation_moves[permutation] * TWIST_COUNT + twist_moves[twist]
+
+
+def find_symmetries():
+    """
+    Returns every (relabel, move_map) such that relabelling the stickers of a
+    quarter twist with relabel gives the twist move_map[move]: the rotations
+    and reflections of the cube that keep the fixed corner in place.
+
+    Each candidate move_map sends faces to faces (possibly reversing the turn
+    direction). Fixing where one sticker goes then decides relabel for every
+    other moving sticker, which is either consistent or not.
+    """
+    home = 3 * FIXED_CORNER
+    stickers = [sticker for sticker in range(3 * CORNERS) if not home <= sticker < home + 3]
+    faces = [move for move in range(len(rubik.quarter_twists)) if move < INVERSE_MOVES[move]]
+
+    symmetries = []
+    for images, flips in product(permutations(faces), product((False, True), repeat=len(faces))):
+        move_map = [0] * len(rubik.quarter_twists)
+        for face, image, flip in zip(faces, images, flips):
+            move_map[face] = INVERSE_MOVES[image] if flip else image
+            move_map[INVERSE_MOVES[face]] = INVERSE_MOVES[move_map[face]]
+
+        for seed in stickers:
+            # relabel must satisfy move[relabel[i]] == relabel[move_map[move][i]].
+            relabel = {stickers[0]: seed}
+            pending = [stickers[0]]
+            consistent = True
+            while pending and consistent:
+                sticker = pending.pop()
+                for move, twist in enumerate(rubik.quarter_twists):
+                    source = rubik.quarter_twists[move_map[move]][sticker]
+                    target = twist[relabel[sticker]]
+                    if source not in relabel:
+                        relabel[source] = target
+                        pending.append(source)
+                    elif relabel[source] != target:
+                        consistent = False
+                        break
+            if consistent and len(set(relabel.values())) == len(stickers):
+                relabel = tuple(relabel.get(sticker, sticker) for sticker in range(3 * CORNERS))
+                symmetries.append((relabel, move_map))
+                break
+
+    return symmetries
+
+
+SYMMETRIES = find_symmetries()
+
+
+def canonical_offset(state):
+    """
+    Returns (code, symmetry): the smallest encoding among the symmetric copies
+    of state and the index in SYMMETRIES of the copy it came from, or
+    (None, None) if state cannot be reached.
+
+    The copy under (relabel, move_map) is relabel^-1 * state * relabel. If
+    moves take the copy to the solved cube, mapping them back through
+    move_map^-1 gives moves that take state there.
+    """
+    best = (None, None)
+    for symmetry, (relabel, _) in enumerate(SYMMETRIES):
+        code = encode(perm_apply(perm_apply(relabel, state), perm_inverse(relabel)))
+        if code is None:
+            return None, None
+        if best[0] is None or code < best[0]:
+            best = (code, symmetry)
+    return best
+
 
 # Gets the next frontier.
-def find_next_frontier(frontier, nodes):
-    start = frontier[0].order
+def find_next_frontier(frontier, parents, other_parents):
+    """
+    Expands every state in frontier by one move and returns the next level
+    along with the first state that the other side has already reached
+    (None if there is none yet).
 
-    while start == frontier[0].order:
-        current = frontier.popleft()
+    States are encoded positions. parents maps every state this side has seen
+    to the index of the move that first reached it, so checking whether a
+    state is new is a single hash lookup and the previous state is recovered
+    by applying the inverse move.
+    """
+    next_frontier = []
 
+    for state in frontier:
+        permutation, twist = divmod(state, TWIST_COUNT)
         # Changes the rubik state.
-        for move in rubik.quarter_twists:
-            move_state = rubik.perm_apply(move, current.state)
-            # Checks to see if the new move_state is not in the nodes list.
-            if move_state not in nodes:
-                # New node_info with the new move_state, the move command it took
-                # frontier that was popped, and the new depth of node.
-                new_state = node_info(move_state, (move, current), current.order + 1)
-                frontier.append(new_state)
-                nodes.append(move_state)
+        for move, (permutation_moves, twist_moves) in enumerate(MOVE_TABLES):
+            move_state = permutation_moves[permutation] * TWIST_COUNT + twist_moves[twist]
+            # Checks to see if the new move_state has not been seen yet.
+            if move_state not in parents:
+                parents[move_state] = move
+                next_frontier.append(move_state)
+                # The two searches meet as soon as one generates a state the
+                # other has already reached.
+                if move_state in other_parents:
+                    return next_frontier, move_state
 
-# Main algorithm.
-def shortest_path(start, end):
+    return next_frontier, None
+
+
+def trace_moves(state, parents):
+    """ Returns the move indices that lead from the root of parents to state. """
+    moves = []
+    while parents[state] is not None:
+        move = parents[state]
+        moves.append(move)
+        state = apply_move(state, INVERSE_MOVES[move])
+    moves.reverse()
+    return moves
+
+
+def expanded_count(frontier, intersection, parents):
     """
-    Using 2-way BFS, finds the shortest path from start_position to
-    end_position. Returns a list of moves.
+    Returns how many states of frontier find_next_frontier expanded, given the
+    intersection it returned (the ones up to and including its parent).
+    """
+    if intersection is None:
+        return len(frontier)
+    parent = apply_move(intersection, INVERSE_MOVES[parents[intersection]])
+    return frontier.index(parent) + 1
 
-    You can use the rubik.quarter_twists move set.
-    Each move can be applied using rubik.perm_apply
+
+def bidirectional_search(start: int, end: int = SOLVED, stats=None) -> Optional[List[int]]:
     """
+    Using 2-way BFS over encoded positions, returns the indices of the moves
+    that take start to end, or None if there are none within 2 * MAX_DEPTH.
+
+    If a stats dict is passed, it receives the number of states expanded
+    ("nodes_expanded") and stored in the visited maps ("nodes_stored").
+    """
+    if start == end:
+        if stats is not None:
+            stats["nodes_expanded"] = 0
+            stats["nodes_stored"] = 1
+        return []
 
     # Start side of BFS.
-    start_initialization = node_info(start, (None, None), 0)
-    start_frontier = deque([start_initialization])
-    start_parents = []
+    start_frontier = [start]
+    start_parents = {start: None}
 
     # End side of BFS.
-    end_initialization = node_info(end, (None, None), 0)
-    end_frontier = deque([end_initialization])
-    end_parents = []
+    end_frontier = [end]
+    end_parents = {end: None}
+
+    # Number of levels explored by each side.
+    start_depth = 0
+    end_depth = 0
 
     # Flag variable to determine which side the frontier changes on.
     flag = 1
 
-    # This checks to see if both sides are the same to return an empty list.
-    for left_current in start_frontier:
-
-        for right_current in end_frontier:
-            if left_current.state == right_current.state:
-                return []
+    intersection = None
+    expanded = 0
 
-    found = False
+    while intersection is None:
 
-    while not found:
-
-        if start_frontier[0].order > 6 and end_frontier[0].order > 6:
-            return None
+        if start_depth >= MAX_DEPTH and end_depth >= MAX_DEPTH:
+            break
+        if not start_frontier or not end_frontier:
+            break
 
-        if flag == 1:
+        if flag == 1 and start_depth < MAX_DEPTH or end_depth >= MAX_DEPTH:
             # Gets the next frontier.
-            find_next_frontier(start_frontier, start_parents)
-            flag = flag * (-1)
+            frontier = start_frontier
+            start_frontier, intersection = find_next_frontier(start_frontier, start_parents, end_parents)
+            expanded += expanded_count(frontier, intersection, start_parents)
+            start_depth += 1
         else:
             # Gets the next frontier.
-            find_next_frontier(end_frontier, end_parents)
-            flag = flag * (-1)
-
-        # Grabs a left element from the starting frontier.
-        for left_current in start_frontier:
-         
-            # Compares it to each of the right elements from the end frontier.
-            for right_current in end_frontier:
-                # If we find an element that matches.
-                if left_current.state == right_current.state:
-                    # Find the intersect of the two lists.
-                    intersection = (left_current, right_current)
-                    # We set found to true.
-                    found = True
-                    # Then break out of the loop.
-                    break
-            # If the element was found we can break out of this loop as well.
-            if found == True:
+            frontier = end_frontier
+            end_frontier, intersection = find_next_frontier(end_frontier, end_parents, start_parents)
+            expanded += expanded_count(frontier, intersection, end_parents)
+            end_depth += 1
+        flag = flag * (-1)
+
+    if stats is not None:
+        stats["nodes_expanded"] = expanded
+        stats["nodes_stored"] = len(start_parents) + len(end_parents)
+    if intersection is None:
+        return None
+
+    # The start side is followed forwards, the end side backwards with every
+    # move inverted.
+    solution = trace_moves(intersection, start_parents)
+    for move in reversed(trace_moves(intersection, end_parents)):
+        solution.append(INVERSE_MOVES[move])
+
+    return solution
+
+
+def build_distance_table(path: str = DISTANCE_FILE) -> str:
+    """
+    Runs one BFS from the solved cube over the whole quarter turn space and
+    writes every position's distance modulo 3 to path. Returns path.
+    """
+    table = bytearray(b"\xff") * ((STATE_COUNT + 3) // 4)
+    table[SOLVED >> 2] ^= 3 << ((SOLVED & 3) << 1)
+
+    frontier = [SOLVED]
+    depth = 0
+    while frontier:
+        depth += 1
+        value = depth % 3
+        next_frontier = []
+        for state in frontier:
+            permutation, twist = divmod(state, TWIST_COUNT)
+            for permutation_moves, twist_moves in MOVE_TABLES:
+                move_state = permutation_moves[permutation] * TWIST_COUNT + twist_moves[twist]
+                shift = (move_state & 3) << 1
+                if (table[move_state >> 2] >> shift) & 3 == 3:
+                    # The two bits are still 11, so xor leaves value behind.
+                    table[move_state >> 2] ^= (3 ^ value) << shift
+                    next_frontier.append(move_state)
+        frontier = next_frontier
+
+    # Write next to path and rename over it, so an interrupted build never
+    # leaves a truncated table behind. The pid keeps workers that build at
+    # the same time apart.
+    temporary = f"{path}.{os.getpid()}.tmp"
+    try:
+        with open(temporary, "wb") as fp:
+            fp.write(DISTANCE_HEADER.pack(DISTANCE_MAGIC, DISTANCE_VERSION, STATE_COUNT))
+            fp.write(table)
+        os.replace(temporary, path)
+    finally:
+        if os.path.exists(temporary):
+            os.remove(temporary)
+    return path
+
+
+def load_distance_table(path: str = DISTANCE_FILE) -> memoryview:
+    """ Maps a table written by build_distance_table into memory. """
+    with open(path, "rb") as fp:
+        mapped = mmap.mmap(fp.fileno(), 0, access=mmap.ACCESS_READ)
+
+    if len(mapped) < DISTANCE_HEADER.size:
+        raise ValueError(f"{path} is not a distance table")
+    magic, version, state_count = DISTANCE_HEADER.unpack_from(mapped)
+    if magic != DISTANCE_MAGIC:
+        raise ValueError(f"{path} is not a distance table")
+    if version != DISTANCE_VERSION:
+        raise ValueError(f"{path} uses unsupported format version {version}")
+    if state_count != STATE_COUNT:
+        raise ValueError(f"{path} holds {state_count} positions instead of {STATE_COUNT}")
+    if len(mapped) != DISTANCE_HEADER.size + (STATE_COUNT + 3) // 4:
+        raise ValueError(f"{path} is {len(mapped)} bytes, not the size of a full table")
+
+    return memoryview(mapped)[DISTANCE_HEADER.size:]
+
+
+def get_distance_table() -> memoryview:
+    """ Returns the mapped DISTANCE_FILE, building it the first time it is missing. """
+    global distance_table
+    if distance_table is None:
+        if not os.path.exists(DISTANCE_FILE):
+            build_distance_table(DISTANCE_FILE)
+        distance_table = load_distance_table(DISTANCE_FILE)
+    return distance_table
+
+
+def table_search(start: int, table: memoryview) -> List[int]:
+    """
+    Returns the indices of the moves that take start to the solved cube by
+    greedy descent through the distance table.
+
+    Every quarter twist changes the distance by exactly one, so the neighbours
+    one step closer are the ones whose distance modulo 3 is one less. Each
+    step takes at most six lookups and there is no search.
+    """
+    moves = []
+    state = start
+    value = (table[state >> 2] >> ((state & 3) << 1)) & 3
+    while state != SOLVED:
+        closer = (value - 1) % 3
+        permutation, twist = divmod(state, TWIST_COUNT)
+        for move, (permutation_moves, twist_moves) in enumerate(MOVE_TABLES):
+            move_state = permutation_moves[permutation] * TWIST_COUNT + twist_moves[twist]
+            if (table[move_state >> 2] >> ((move_state & 3) << 1)) & 3 == closer:
                 break
-    # Solution list.
-    solution = []
+        moves.append(move)
+        state = move_state
+        value = closer
+    return moves
 
-    left_temp = intersection[0]
-    
-    # These while loops populate the solution list.
-    while (left_temp.state != start):
-        solution.insert(0, left_temp.parent[0])
-        left_temp = left_temp.parent[1]
 
-    right_temp = intersection[1]
+def ida_search(start: int, stats=None) -> List[int]:
+    """
+    Using IDA*, returns the indices of the moves that take start to the
+    solved cube.
 
-    while (right_temp.state != end):
-        solution.append(rubik.perm_inverse(right_temp.parent[0]))
-        right_temp = right_temp.parent[1]
+    The heuristic is the larger of PERMUTATION_DISTANCES and TWIST_DISTANCES,
+    which never overestimates, so the first solution found is a shortest one.
+    Each round is a depth first search that cuts off paths whose length plus
+    heuristic exceeds the bound, and the next bound is the smallest value
+    that was cut off. Only the current path is stored, and a move is never
+    followed by its own inverse.
 
-    return solution
+    If a stats dict is passed, it receives the number of states expanded over
+    all rounds ("nodes_expanded") and the longest path held ("nodes_stored").
+    """
+    solved_permutation, solved_twist = divmod(SOLVED, TWIST_COUNT)
+    path = []
+    expanded = 0
+
+    def depth_first(permutation, twist, bound, last):
+        nonlocal expanded
+        estimate = len(path) + max(PERMUTATION_DISTANCES[permutation], TWIST_DISTANCES[twist])
+        if estimate > bound:
+            return estimate
+        if permutation == solved_permutation and twist == solved_twist:
+            return None
+
+        expanded += 1
+        smallest = None
+        for move, (permutation_moves, twist_moves) in enumerate(MOVE_TABLES):
+            if last is not None and move == INVERSE_MOVES[last]:
+                continue
+            path.append(move)
+            result = depth_first(permutation_moves[permutation], twist_moves[twist], bound, move)
+            if result is None:
+                return None
+            path.pop()
+            if smallest is None or result < smallest:
+                smallest = result
+        return smallest
+
+    permutation, twist = divmod(start, TWIST_COUNT)
+    bound = max(PERMUTATION_DISTANCES[permutation], TWIST_DISTANCES[twist])
+    while True:
+        bound = depth_first(permutation, twist, bound, None)
+        if bound is None:
+            break
+
+    if stats is not None:
+        stats["nodes_expanded"] = expanded
+        stats["nodes_stored"] = len(path) + 1
+    return path
+
+
+# Main algorithm.
+def shortest_path(start, end, engine="bfs", stats=None):
+    """
+    Using 2-way BFS, finds the shortest path from start_position to
+    end_position. Returns a list of moves.
+
+    You can use the rubik.quarter_twists move set.
+    Each move can be applied using rubik.perm_apply
+
+    The moves that take start to end are the moves that take
+    end^-1 * start to the solved cube, so only that one offset position is
+    encoded and searched.
+
+    engine picks how: "bfs" searches from scratch, "table" descends through
+    the precomputed distance table (see get_distance_table) and "ida" runs
+    IDA* with pattern database bounds in memory proportional to the depth.
+    If a stats dict is passed, the "bfs" and "ida" engines fill it with
+    their node counts.
+    """
+    if engine not in ENGINES:
+        raise ValueError(f"unknown engine {engine!r}, expected one of {ENGINES}")
+
+    # This checks to see if both sides are the same to return an empty list.
+    if start == end:
+        return []
+
+    offset = encode(perm_apply(start, perm_inverse(end)))
+    if offset is None:
+        return None
+
+    moves = solve_code(offset, engine, stats)
+    if moves is None:
+        return None
+
+    return [rubik.quarter_twists[move] for move in moves]
+
+
+def solve_code(code: int, engine: str = "bfs", stats=None) -> Optional[List[int]]:
+    """ Returns the move indices that take an encoded position to the solved cube. """
+    if engine == "table":
+        return table_search(code, get_distance_table())
+    if engine == "ida":
+        return ida_search(code, stats)
+    return bidirectional_search(code, stats=stats)
+
+
+def solve_many(pairs, workers: int = None, engine: str = "bfs", chunksize: int = SOLVE_CHUNK_SIZE):
+    """
+    Solves many (start, end) queries on a pool of processes and yields
+    shortest_path(start, end, engine) for each one, in order.
+
+    Queries are reduced to their offset position and then to the smallest of
+    its symmetric copies, so every distinct position up to symmetry is solved
+    only once. The move tables are built at import, so forked workers share
+    them, and the distance table is built up front so every worker maps the
+    same file.
+
+    :param pairs: iterable of (start, end) positions
+    :param workers: number of processes to use, defaults to the number of CPUs
+    :param engine: "bfs", "table" or "ida", as for shortest_path
+    :param chunksize: number of distinct queries sent to a worker at a time
+    """
+    if engine not in ENGINES:
+        raise ValueError(f"unknown engine {engine!r}, expected one of {ENGINES}")
+    if engine == "table":
+        get_distance_table()
+
+    queries = [canonical_offset(perm_apply(start, perm_inverse(end))) for start, end in pairs]
+    unique = list(dict.fromkeys(code for code, _ in queries if code is not None))
+    inverse_maps = [[move_map.index(move) for move in range(len(move_map))] for _, move_map in SYMMETRIES]
+
+    with ProcessPoolExecutor(workers) as executor:
+        results = zip(unique, executor.map(solve_code, unique, repeat(engine), chunksize=chunksize))
+        solved = {}
+
+        for code, symmetry in queries:
+            if code is None:
+                yield None
+                continue
+            # Results arrive in the order codes first appear, so the one this
+            # query needs is either solved already or among the next ones.
+            while code not in solved:
+                next_code, moves = next(results)
+                solved[next_code] = moves
+            moves = solved[code]
+            if moves is None:
+                yield None
+            else:
+                yield [rubik.quarter_twists[inverse_maps[symmetry][move]] for move in moves]
@@ -0,0 +1,143 @@
+import random
+import sys
+import time
+from array import array
+from typing import Dict
+
+import huffman
+
+"""
+Benchmarks for huffman.py.
+
+Usage: python benchmark.py [size_in_MB ...]
+
+Each size is run through compress() once, then decompressed with the
+table-driven decoder. The original decoder, which compares every slice of
+the bit string against the whole decoder ring, is only timed on inputs up
+to LEGACY_LIMIT bytes since it is far too slow past that.
+
+Afterwards, SMALL_MESSAGES short messages are compressed both with their
+own tree and decoder ring and against a codebook trained on TRAINING_MESSAGES
+other messages from the same source.
+"""
+
+LEGACY_LIMIT = 1 << 18
+SMALL_MESSAGES = 20000
+TRAINING_MESSAGES = 2000
+
+
+def sample_message(size: int, seed: int = 440) -> bytes:
+    """ Builds a skewed, text-like message of the given size. """
+    rng = random.Random(seed)
+    alphabet = bytes(range(32, 127)) + b"\n\t"
+    weights = [1.0 / (rank + 1) for rank in range(len(alphabet))]
+    block = bytes(rng.choices(alphabet, weights, k=min(size, 1 << 20)))
+    return (block * (size // len(block) + 1))[:size]
+
+
+def legacy_decode(message: str, decoder_ring: Dict) -> array:
+    """ The original decoder, kept here for comparison. """
+    new_message = array('B')
+
+    code_list = list(decoder_ring.items())
+
+    i = 0
+    j = i + 1
+
+    while j <= len(message):
+        for k in range(len(code_list)):
+            if message[i:j] == code_list[k][1]:
+                new_message.append(code_list[k][0])
+                i += j - i
+                j = i
+                break
+        j += 1
+
+    return new_message
+
+
+def legacy_decompress(message: bytes, decoder_ring: Dict) -> array:
+    """ The original decompress, which expands the bytes into a bit string first. """
+    raw_message = "".join(bin(bit)[2:].rjust(8, '0') for bit in message)
+    message_padding = decoder_ring["pad"]
+    return legacy_decode(raw_message[0:len(raw_message) - message_padding], decoder_ring)
+
+
+def timed(function, *args):
+    start = time.perf_counter()
+    result = function(*args)
+    return result, time.perf_counter() - start
+
+
+def bench_decode(size: int):
+    message = sample_message(size)
+    compressed, decoder_ring = huffman.compress(message)
+
+    result, seconds = timed(huffman.decompress, compressed, decoder_ring)
+    assert bytes(result) == message
+    line = f"{size:>12} bytes  table decoder {seconds:9.3f}s ({size / seconds / 1e6:7.2f} MB/s)"
+
+    if size <= LEGACY_LIMIT:
+        result, seconds = timed(legacy_decompress, compressed, decoder_ring)
+        assert bytes(result) == message
+        line += f"  legacy decoder {seconds:9.3f}s"
+
+    print(line)
+
+
+def small_messages(count: int, seed: int) -> list:
+    """ Cuts a sample message into pieces of 16 to 256 bytes. """
+    rng = random.Random(seed)
+    source = sample_message(count * 256, seed)
+    messages = []
+    position = 0
+    for _ in range(count):
+        length = rng.randint(16, 256)
+        messages.append(source[position:position + length])
+        position += length
+    return messages
+
+
+def bench_codebook():
+    messages = small_messages(SMALL_MESSAGES, 1)
+    original_size = sum(len(message) for message in messages)
+
+    # Every message carries its own container header with the code lengths.
+    start = time.perf_counter()
+    per_message = []
+    for message in messages:
+        compressed, decoder_ring = huffman.compress(message)
+        per_message.append((compressed, decoder_ring))
+    compress_seconds = time.perf_counter() - start
+    size = sum(huffman.CONTAINER_HEADER.size + len(compressed) for compressed, _ in per_message)
+
+    start = time.perf_counter()
+    for (compressed, decoder_ring), message in zip(per_message, messages):
+        assert bytes(huffman.decompress(compressed, decoder_ring)) == message
+    decompress_seconds = time.perf_counter() - start
+    print(f"{len(messages)} messages, {original_size} bytes")
+    print(f"  per-message trees  {size:>10} bytes  compress {len(messages) / compress_seconds:9.0f} msg/s"
+          f"  decompress {len(messages) / decompress_seconds:9.0f} msg/s")
+
+    codebook = huffman.train_codebook(small_messages(TRAINING_MESSAGES, 2))
+    codebooks = {1: codebook}
+    tables = {}
+
+    start = time.perf_counter()
+    shared = [huffman.compress_with_codebook(message, codebook, 1) for message in messages]
+    compress_seconds = time.perf_counter() - start
+    size = sum(len(compressed) for compressed in shared)
+
+    start = time.perf_counter()
+    for compressed, message in zip(shared, messages):
+        assert bytes(huffman.decompress_with_codebook(compressed, codebooks, tables)) == message
+    decompress_seconds = time.perf_counter() - start
+    print(f"  shared codebook    {size:>10} bytes  compress {len(messages) / compress_seconds:9.0f} msg/s"
+          f"  decompress {len(messages) / decompress_seconds:9.0f} msg/s")
+
+
+if __name__ == '__main__':
+    sizes = [float(arg) for arg in sys.argv[1:]] or [1]
+    for megabytes in sizes:
+        bench_decode(int(megabytes * (1 << 20)))
+    bench_codebook()
@@ -1,11 +1,57 @@
+import heapq
 import marshal
+import mmap
 import os
 import pickle
+import struct
 import sys
 from array import array
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
 from typing import Dict
+from typing import List
 from typing import Tuple
 
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+# Number of bits looked up at once by the first level of the decoding table.
+TABLE_BITS = 10
+
+# Compressed file header: signature, format version, padding bits in the last
+# byte and the canonical code length of each of the 256 byte values.
+CONTAINER_MAGIC = b"HUF"
+CONTAINER_VERSION = 1
+CONTAINER_HEADER = struct.Struct(">3sBB256s")
+
+# Streaming mode: bytes of input per frame, the stream header (signature,
+# format version, code lengths) and the per-frame header (payload length in
+# bytes, padding bits in the last byte).
+STREAM_CHUNK_SIZE = 1 << 20
+STREAM_MAGIC = b"HUFS"
+STREAM_HEADER = struct.Struct(">4sB256s")
+FRAME_HEADER = struct.Struct(">IB")
+
+# Parallel mode: bytes of input per block, the file header (signature, format
+# version, code lengths, number of blocks) and one index entry per block
+# (offset from the end of the index, payload length, padding bits).
+PARALLEL_BLOCK_SIZE = 1 << 22
+BLOCKED_MAGIC = b"HUFB"
+BLOCKED_HEADER = struct.Struct(">4sB256sI")
+BLOCK_ENTRY = struct.Struct(">QIB")
+
+# Shared codebooks: the codebook file (signature, format version, codebook id,
+# code lengths) and the header of each message compressed against one
+# (codebook id, padding bits). ESCAPE stands in for every byte the training
+# samples never contained while the tree is built.
+CODEBOOK_MAGIC = b"HUFD"
+CODEBOOK_HEADER = struct.Struct(">4sBI256s")
+MESSAGE_HEADER = struct.Struct(">IB")
+ESCAPE = 256
+
 """
 Invariant Documentation:
 
@@ -33,85 +79,224 @@ Termination: At the end of the algorithm, the priority queue contains a
              constructed coding is optimal.
 """
 
-def encode(message: bytes) -> Tuple[str, Dict]:
+def encode(message: bytes, frequency_list: Dict = None, codex: Dict = None) -> Tuple[str, Dict]:
     """ Given the bytes read from a file, encodes the contents using the Huffman encoding algorithm.
 
     :param message: raw sequence of bytes from a file
+    :param frequency_list: precomputed histogram to build the codes from instead of counting the message
+    :param codex: precomputed codes to use as is, skipping both counting and tree building
     :returns: string of 1s and 0s representing the encoded message
     dict containing the decoder ring as explained in lecture and handout.
     """
-    frequency_list = {}
-    for character in message:
-        frequency_list[character] = frequency_list.get(character, 0) + 1
-    dataset = frequency_list.keys()
-    raw_data = []
+    if codex is None:
+        codex = build_codex(histogram(message) if frequency_list is None else frequency_list)
 
-    for data in dataset:
-        raw_data.append((frequency_list[data], data))
+    new_message = "".join([codex[character] for character in message])
 
-    raw_data.sort()
+    return new_message, codex
 
-    while len(raw_data) > 1:
-        lowest_two_weights = tuple(raw_data[0:2])
-        higher_weights = raw_data[2:]
-        x = lowest_two_weights[0][0] + lowest_two_weights[1][0]
-        raw_data = higher_weights + [(x, lowest_two_weights)]
-        maximum = len(raw_data) - 1
-        raw_data = quick_sort(raw_data, 0, maximum)
+def histogram(message: bytes) -> Dict:
+    """ Counts how many times each symbol appears in the message.
 
-    raw_data = raw_data[0]
+    Bytes and arrays of 8 or 16-bit values are counted with numpy.bincount when
+    numpy is installed. Anything else goes through collections.Counter, which
+    counts in C as well.
 
-    tree = trim_dataset(raw_data)
+    :param message: raw sequence of bytes from a file, or any sequence of hashable symbols
+    :returns: dict mapping each symbol that appears to its count
+    """
+    if numpy is not None:
+        if isinstance(message, (bytes, bytearray, memoryview)):
+            values = numpy.frombuffer(message, dtype=numpy.uint8)
+        elif isinstance(message, array) and message.typecode in ('B', 'H'):
+            values = numpy.frombuffer(message, dtype=numpy.uint8 if message.typecode == 'B' else numpy.uint16)
+        else:
+            values = None
 
-    codex = {}
+        if values is not None:
+            counts = numpy.bincount(values)
+            return {int(symbol): int(counts[symbol]) for symbol in numpy.flatnonzero(counts)}
 
-    codex = codemaker(tree)
+    return Counter(message)
 
-    new_message = ""
-    for character in message:
-        new_message += codex[character]
+def build_codex(frequency_list: Dict) -> Dict:
+    """ Given the number of times each symbol appears, builds the Huffman tree and returns the code for each symbol.
 
-    return new_message, codex
+    The tree is built with a priority queue. Nodes are numbered with leaves first (in
+    ascending symbol order) and merged nodes after them in the order they are created,
+    and ties between equal weights go to the lower number, so the codes are reproducible.
 
-def trim_dataset(dataset):
-    x = dataset[1]
-    if not isinstance(x, tuple):
-        return x
-    else:
-        return(trim_dataset(x[0]), trim_dataset(x[1]))
-    
-def quick_sort(list, lo, hi):
-    if lo < hi:
-        pi = quick_part(list, lo, hi)
-        quick_sort(list, lo, pi -1)
-        quick_sort(list, pi + 1, hi)
-    return list
-
-def quick_part(list, lo, hi):
-    i = lo - 1
-    pivot = list[hi]
-    for j in range(lo, hi):
-        if list[j][0] < pivot[0]:
-            i = i + 1
-            list[i], list[j] = list[j], list[i]
-    list[i + 1], list[hi] = list[hi], list[i + 1]
-    return (i + 1)
-
-def codemaker(tree):
+    :param frequency_list: dict mapping each symbol to its count
+    :returns: dict containing the decoder ring
+    """
+    symbols = sorted(frequency_list)
+    if len(symbols) == 1:
+        # A lone symbol still needs a one bit code so its occurrences can be counted.
+        return {symbols[0]: "0"}
+
+    queue = [(frequency_list[symbol], node) for node, symbol in enumerate(symbols)]
+    heapq.heapify(queue)
+    parent = [0] * (2 * len(symbols) - 1)
+
+    node = len(symbols)
+    while len(queue) > 1:
+        weight1, node1 = heapq.heappop(queue)
+        weight2, node2 = heapq.heappop(queue)
+        parent[node1] = node
+        parent[node2] = node
+        heapq.heappush(queue, (weight1 + weight2, node))
+        node += 1
+
+    # Merged nodes are numbered after their children, so walking down from the
+    # root (the last node) sets every parent's depth before its children's.
+    depth = [0] * len(parent)
+    for node in range(len(parent) - 2, -1, -1):
+        depth[node] = depth[parent[node]] + 1
+
+    code_lengths = {symbol: depth[node] for node, symbol in enumerate(symbols)}
+
+    return canonical_codex(code_lengths)
+
+def canonical_codex(code_lengths: Dict) -> Dict:
+    """ Given the code length of each symbol, assigns canonical Huffman codes.
+
+    Symbols are ordered by code length and then by value, and each one gets the next
+    code of its length. The whole codex can then be rebuilt from the lengths alone.
+
+    :param code_lengths: dict mapping each symbol to the length of its code
+    :returns: dict containing the decoder ring
+    """
     codex = {}
+    code = 0
+    previous_length = 0
 
-    pattern = ""
-    codex = codeHelper(tree, codex, pattern)
+    for length, symbol in sorted((length, symbol) for symbol, length in code_lengths.items()):
+        code <<= length - previous_length
+        codex[symbol] = format(code, f"0{length}b") if length else ""
+        code += 1
+        previous_length = length
 
     return codex
 
-def codeHelper(tree, codex, code):
-    if not isinstance(tree, tuple):
-        codex[tree] = code
+def ring_to_lengths(decoder_ring: Dict) -> bytes:
+    """ Given a decoder ring over byte values, returns the code length of every byte (0 if unused).
+
+    :param decoder_ring: dict containing the decoder ring
+    :returns: 256 bytes, one code length per byte value
+    """
+    code_lengths = bytearray(256)
+    for symbol, code in decoder_ring.items():
+        if symbol != "pad":
+            code_lengths[symbol] = len(code)
+    return bytes(code_lengths)
+
+def lengths_to_ring(code_lengths: bytes) -> Dict:
+    """ Given the code length of every byte value, rebuilds the canonical decoder ring.
+
+    :param code_lengths: 256 bytes, one code length per byte value
+    :returns: dict containing the decoder ring
+    """
+    return canonical_codex({symbol: length for symbol, length in enumerate(code_lengths) if length})
+
+def build_decode_table(decoder_ring: Dict, table_bits: int = TABLE_BITS) -> Tuple[int, Tuple]:
+    """ Given a decoder ring, builds a lookup table for decoding several bits at a time.
+
+    The first level of the table is indexed by the next table_bits bits of the message.
+    Codes that are longer than that share an entry that points to an overflow subtable,
+    which is indexed by the bits that follow (and may overflow again for very long codes).
+
+    :param decoder_ring: dict containing the decoder ring
+    :param table_bits: number of bits looked up by each level of the table
+    :returns: length of the longest code
+    table of the form (number of bits, list of symbols, list of code lengths)
+    """
+    codes = [(code, symbol) for symbol, code in decoder_ring.items() if symbol != "pad"]
+    max_length = max((len(code) for code, _ in codes), default=0)
+
+    return max_length, make_table(codes, table_bits, 0)
+
+def make_table(codes, table_bits, consumed):
+    bits = min(table_bits, max((len(code) for code, _ in codes), default=0))
+
+    symbols = [None] * (1 << bits)
+    lengths = [0] * (1 << bits)
+    overflow = {}
+
+    for code, symbol in codes:
+        length = len(code)
+        if length <= bits:
+            start = int(code, 2) << (bits - length) if code else 0
+            for index in range(start, start + (1 << (bits - length))):
+                symbols[index] = symbol
+                lengths[index] = consumed + length
+        else:
+            prefix = int(code[:bits], 2)
+            overflow.setdefault(prefix, []).append((code[bits:], symbol))
+
+    # A length of 0 marks an entry whose symbol is a subtable.
+    for prefix, rest in overflow.items():
+        symbols[prefix] = make_table(rest, table_bits, consumed + bits)
+
+    return bits, symbols, lengths
+
+
+def decode_bytes(message: bytes, bit_count: int, decoder_ring: Dict, table: Tuple = None) -> array:
+    """ Given packed bytes and the number of meaningful bits in them, decodes the message using a lookup table.
+
+    :param message: bytes holding the encoded message, most significant bit first
+    :param bit_count: number of bits of the message that are part of the encoding
+    :param decoder_ring: dict containing the decoder ring
+    :param table: result of build_decode_table for the ring, to reuse it across calls
+    :returns: raw sequence of bytes that represent a decoded file (an array('H') for
+    16-bit symbols, or a list for any other alphabet)
+    """
+    max_length, root = build_decode_table(decoder_ring) if table is None else table
+    table_bits, root_symbols, root_lengths = root
+
+    alphabet = [symbol for symbol in decoder_ring if symbol != "pad"]
+    if all(isinstance(symbol, int) and 0 <= symbol < 256 for symbol in alphabet):
+        new_message = array('B')
+    elif all(isinstance(symbol, int) and 0 <= symbol < 65536 for symbol in alphabet):
+        new_message = array('H')
     else:
-        codeHelper(tree[0], codex, code + "0")
-        codeHelper(tree[1], codex, code + "1")
-    return codex
+        new_message = []
+    append = new_message.append
+    message = memoryview(message)
+
+    accumulator = 0
+    available = 0
+    position = 0
+    remaining = bit_count
+
+    while remaining > 0:
+        # Refill seven bytes at a time so the accumulator always holds a whole code.
+        while available < max_length:
+            chunk = bytes(message[position:position + 7])
+            if len(chunk) < 7:
+                chunk += bytes(7 - len(chunk))
+            accumulator = ((accumulator & ((1 << available) - 1)) << 56) | int.from_bytes(chunk, 'big')
+            available += 56
+            position += 7
+
+        index = (accumulator >> (available - table_bits)) & ((1 << table_bits) - 1)
+        length = root_lengths[index]
+        symbol = root_symbols[index]
+
+        offset = table_bits
+        while not length:
+            bits, symbols, lengths = symbol
+            offset += bits
+            index = (accumulator >> (available - offset)) & ((1 << bits) - 1)
+            length = lengths[index]
+            symbol = symbols[index]
+
+        append(symbol)
+
+        available -= length
+        remaining -= length
+
+    return new_message
+
 
 def decode(message: str, decoder_ring: Dict) -> bytes:
     """ Given the encoded string and the decoder ring, decodes the message using the Huffman decoding algorithm.
@@ -120,48 +305,79 @@ def decode(message: str, decoder_ring: Dict) -> bytes:
     :param decoder_ring: dict containing the decoder ring
     return: raw sequence of bytes that represent a decoded file
     """
-    new_message = array('B')
-
-    code_list = list(decoder_ring.items())
+    if not message:
+        return array('B')
 
-    i = 0
-    j = i + 1
+    padding = -len(message) % 8
+    packed = int(message + "0" * padding, 2).to_bytes((len(message) + padding) // 8, 'big')
 
-    while j <= len(message):
-        for k in range(len(code_list)):
-            if message[i:j] == code_list[k][1]:
-                new_message.append(code_list[k][0])
-                i += j - i
-                j = i
-                break
-        j += 1
-
-    return new_message
+    return decode_bytes(packed, len(message), decoder_ring)
 
 
-def compress(message: bytes) -> Tuple[array, Dict]:
+def compress(message: bytes, frequency_list: Dict = None, codex: Dict = None) -> Tuple[array, Dict]:
     """ Given the bytes read from a file, calls encode and turns the string into an array of bytes to be written to disk.
 
     :param message: raw sequence of bytes from a file
+    :param frequency_list: precomputed histogram to build the codes from instead of counting the message
+    :param codex: precomputed codes whose lengths are used, skipping both counting and tree building
     :returns: array of bytes to be written to disk
     dict containing the decoder ring
     """
-    code_message, codex = encode(message)
+    if codex is None:
+        if frequency_list is None:
+            frequency_list = histogram(message)
+        codex = build_codex(frequency_list)
+    else:
+        # write_compressed only stores code lengths, so the codes are made
+        # canonical here to match what read_compressed rebuilds from them.
+        codex = canonical_codex({symbol: len(code) for symbol, code in codex.items() if symbol != "pad"})
 
-    message_padding = 8 - len(code_message) % 8
+    compressed_message, message_padding = pack_bits(message, codex, frequency_list)
 
     value = {"pad": message_padding}
     codex.update(value)
 
-    for i in range(message_padding):
-        code_message += "0"
+    return compressed_message, codex
 
-    compressed_message = bytearray()
-    for i in range(0, len(code_message), 8):
-        byte = code_message[i:i+8]
-        compressed_message.append(int(byte,2))
 
-    return compressed_message, codex
+def pack_bits(message: bytes, codex: Dict, frequency_list: Dict = None) -> Tuple[bytearray, int]:
+    """ Given the bytes read from a file and the code for each byte, writes the codes straight into a byte buffer.
+
+    :param message: raw sequence of bytes from a file
+    :param codex: dict containing the code for each byte
+    :param frequency_list: histogram of the message, used to size the buffer exactly
+    :returns: bytearray holding the packed codes, most significant bit first
+    number of padding bits at the end of the last byte
+    """
+    codes = {symbol: (int(code, 2) if code else 0, len(code)) for symbol, code in codex.items() if symbol != "pad"}
+
+    # Without a histogram, size the buffer for the longest code and trim it afterwards.
+    if frequency_list is None:
+        bit_count = len(message) * max((length for _, length in codes.values()), default=0)
+    else:
+        bit_count = sum(codes[symbol][1] * count for symbol, count in frequency_list.items())
+    packed = bytearray((bit_count + 7) // 8 + 8)
+
+    accumulator = 0
+    available = 0
+    position = 0
+
+    # Flush the accumulator 64 bits at a time so it never grows past a couple of words.
+    for symbol in message:
+        code, length = codes[symbol]
+        accumulator = (accumulator << length) | code
+        available += length
+        if available >= 64:
+            available -= 64
+            packed[position:position + 8] = (accumulator >> available).to_bytes(8, 'big')
+            accumulator &= (1 << available) - 1
+            position += 8
+
+    tail_bytes = (available + 7) // 8
+    packed[position:position + tail_bytes] = (accumulator << (tail_bytes * 8 - available)).to_bytes(tail_bytes, 'big')
+    del packed[position + tail_bytes:]
+
+    return packed, -available % 8
 
 
 def decompress(message: array, decoder_ring: Dict) -> bytes:
@@ -171,57 +387,343 @@ def decompress(message: array, decoder_ring: Dict) -> bytes:
     :param decoder_ring: dict containing the decoder ring
     :return: raw sequence of bytes that represent a decompressed file
     """
-    byte_array = array('B', message)
+    message_padding = decoder_ring.get("pad")
+    bit_count = len(message) * 8 - message_padding
 
-    raw_message = ""
+    final_message = decode_bytes(message, bit_count, decoder_ring)
 
-    for bit in byte_array:
-        bits = bin(bit)[2:].rjust(8, '0')
-        raw_message += bits
+    return final_message
 
-    message_padding = decoder_ring.get("pad")
-    final_message = raw_message[0:len(raw_message) - message_padding]
+def write_compressed(fp, message: bytes, decoder_ring: Dict):
+    """ Writes a compressed message and its decoder ring in the container format.
 
-    final_message = decode(final_message, decoder_ring)
+    The container is a fixed size header (signature, format version, padding bits
+    and the code length of each byte) followed by the packed payload.
 
-    return final_message
+    :param fp: binary file object to write to
+    :param message: packed bytes returned by compress
+    :param decoder_ring: dict containing the decoder ring, including "pad"
+    """
+    fp.write(CONTAINER_HEADER.pack(CONTAINER_MAGIC, CONTAINER_VERSION, decoder_ring.get("pad", 0), ring_to_lengths(decoder_ring)))
+    fp.write(message)
+
+
+def read_compressed(path: str) -> Tuple[memoryview, Dict]:
+    """ Maps a file written by write_compressed into memory and rebuilds its decoder ring.
+
+    :param path: path of the compressed file
+    :returns: memoryview of the packed payload
+    dict containing the decoder ring, including "pad"
+    """
+    with open(path, 'rb') as fp:
+        mapped = mmap.mmap(fp.fileno(), 0, access=mmap.ACCESS_READ)
+
+    magic, version, message_padding, code_lengths = CONTAINER_HEADER.unpack_from(mapped)
+    if magic != CONTAINER_MAGIC:
+        raise ValueError(f"{path} is not a compressed file")
+    if version != CONTAINER_VERSION:
+        raise ValueError(f"{path} uses unsupported format version {version}")
+
+    decoder_ring = lengths_to_ring(code_lengths)
+    decoder_ring["pad"] = message_padding
+
+    return memoryview(mapped)[CONTAINER_HEADER.size:], decoder_ring
+
+
+def compress_stream(infile, outfile, chunk_size: int = STREAM_CHUNK_SIZE):
+    """ Compresses a file one chunk at a time so memory stays bounded by the chunk size.
+
+    The first pass counts bytes over the whole file so every frame shares a single
+    decoder ring. The second pass encodes each chunk into its own frame.
+
+    :param infile: binary file object to read from, must be seekable
+    :param outfile: binary file object to write the stream to
+    :param chunk_size: number of input bytes encoded into each frame
+    """
+    frequency_list = Counter()
+    for chunk in iter(lambda: infile.read(chunk_size), b""):
+        frequency_list.update(histogram(chunk))
+    infile.seek(0)
+
+    codex = build_codex(frequency_list)
+    outfile.write(STREAM_HEADER.pack(STREAM_MAGIC, CONTAINER_VERSION, ring_to_lengths(codex)))
+
+    for chunk in iter(lambda: infile.read(chunk_size), b""):
+        packed, message_padding = pack_bits(chunk, codex)
+        outfile.write(FRAME_HEADER.pack(len(packed), message_padding))
+        outfile.write(packed)
+
+
+def decompress_stream(infile, outfile):
+    """ Decompresses a stream written by compress_stream one frame at a time.
+
+    :param infile: binary file object holding the compressed stream
+    :param outfile: binary file object to write the decompressed bytes to
+    """
+    magic, version, code_lengths = STREAM_HEADER.unpack(infile.read(STREAM_HEADER.size))
+    if magic != STREAM_MAGIC:
+        raise ValueError("not a compressed stream")
+    if version != CONTAINER_VERSION:
+        raise ValueError(f"unsupported stream format version {version}")
+    decoder_ring = lengths_to_ring(code_lengths)
+
+    for header in iter(lambda: infile.read(FRAME_HEADER.size), b""):
+        payload_length, message_padding = FRAME_HEADER.unpack(header)
+        payload = infile.read(payload_length)
+        outfile.write(decode_bytes(payload, payload_length * 8 - message_padding, decoder_ring))
+
+
+def compress_parallel(message: bytes, block_size: int = PARALLEL_BLOCK_SIZE, workers: int = None) -> Tuple[List[Tuple[bytearray, int]], Dict]:
+    """ Splits the message into blocks and compresses them on a pool of processes.
+
+    Every block is counted in parallel and the counts are merged into a single
+    decoder ring, so each block can later be decoded on its own.
+
+    :param message: raw sequence of bytes from a file
+    :param block_size: number of input bytes in each block
+    :param workers: number of processes to use, defaults to the number of CPUs
+    :returns: list of (packed bytes, padding bits) for each block
+    dict containing the decoder ring
+    """
+    chunks = [message[i:i + block_size] for i in range(0, len(message), block_size)]
+
+    with ProcessPoolExecutor(workers) as executor:
+        chunk_counts = list(executor.map(histogram, chunks))
+        frequency_list = Counter()
+        for counts in chunk_counts:
+            frequency_list.update(counts)
+
+        codex = build_codex(frequency_list)
+        blocks = list(executor.map(pack_bits, chunks, repeat(codex), chunk_counts))
+
+    return blocks, codex
+
+
+def decompress_block(block: Tuple[bytes, int], decoder_ring: Dict) -> array:
+    """ Decodes a single block produced by compress_parallel.
+
+    :param block: packed bytes and padding bits of the block
+    :param decoder_ring: dict containing the decoder ring
+    :returns: raw sequence of bytes held by the block
+    """
+    packed, message_padding = block
+    return decode_bytes(packed, len(packed) * 8 - message_padding, decoder_ring)
+
+
+def decompress_parallel(blocks: List[Tuple[bytes, int]], decoder_ring: Dict, workers: int = None) -> bytes:
+    """ Decodes the blocks produced by compress_parallel on a pool of processes.
+
+    :param blocks: list of (packed bytes, padding bits) for each block
+    :param decoder_ring: dict containing the decoder ring
+    :param workers: number of processes to use, defaults to the number of CPUs
+    :returns: raw sequence of bytes that represent a decompressed file
+    """
+    blocks = [(bytes(packed), message_padding) for packed, message_padding in blocks]
+
+    with ProcessPoolExecutor(workers) as executor:
+        return b"".join(executor.map(decompress_block, blocks, repeat(decoder_ring)))
+
+
+def write_blocks(fp, blocks: List[Tuple[bytearray, int]], decoder_ring: Dict):
+    """ Writes the blocks produced by compress_parallel along with an index of where each one starts.
+
+    :param fp: binary file object to write to
+    :param blocks: list of (packed bytes, padding bits) for each block
+    :param decoder_ring: dict containing the decoder ring
+    """
+    fp.write(BLOCKED_HEADER.pack(BLOCKED_MAGIC, CONTAINER_VERSION, ring_to_lengths(decoder_ring), len(blocks)))
+
+    offset = 0
+    for packed, message_padding in blocks:
+        fp.write(BLOCK_ENTRY.pack(offset, len(packed), message_padding))
+        offset += len(packed)
+
+    for packed, _ in blocks:
+        fp.write(packed)
+
+
+def read_blocks(path: str) -> Tuple[List[Tuple[memoryview, int]], Dict]:
+    """ Maps a file written by write_blocks into memory and returns a view of every block.
+
+    Only the header and index are read, so any single block can be handed to
+    decompress_block without touching the others.
+
+    :param path: path of the compressed file
+    :returns: list of (packed bytes, padding bits) for each block
+    dict containing the decoder ring
+    """
+    with open(path, 'rb') as fp:
+        mapped = mmap.mmap(fp.fileno(), 0, access=mmap.ACCESS_READ)
+
+    magic, version, code_lengths, block_count = BLOCKED_HEADER.unpack_from(mapped)
+    if magic != BLOCKED_MAGIC:
+        raise ValueError(f"{path} is not a block compressed file")
+    if version != CONTAINER_VERSION:
+        raise ValueError(f"{path} uses unsupported format version {version}")
+
+    view = memoryview(mapped)
+    start = BLOCKED_HEADER.size + block_count * BLOCK_ENTRY.size
+    blocks = []
+    for number in range(block_count):
+        offset, length, message_padding = BLOCK_ENTRY.unpack_from(mapped, BLOCKED_HEADER.size + number * BLOCK_ENTRY.size)
+        blocks.append((view[start + offset:start + offset + length], message_padding))
+
+    return blocks, lengths_to_ring(code_lengths)
+
+
+def train_codebook(samples: List[bytes]) -> Dict:
+    """ Builds one codebook from a sample corpus, to be shared by many small messages.
+
+    Bytes that never appear in the samples are counted as a single escape symbol,
+    once per sample. Each of them then gets the escape code's length plus 8 bits,
+    which is the cost of an escape code followed by the raw byte, and the codes are
+    made canonical so the codebook covers every byte value.
+
+    :param samples: list of messages representative of the ones to be compressed
+    :returns: dict containing the decoder ring for all 256 byte values
+    """
+    frequency_list = Counter()
+    for sample in samples:
+        frequency_list.update(histogram(sample))
+
+    unseen = [symbol for symbol in range(256) if symbol not in frequency_list]
+    if unseen:
+        frequency_list[ESCAPE] = max(len(samples), 1)
+
+    code_lengths = {symbol: len(code) for symbol, code in build_codex(frequency_list).items()}
+    escape_length = code_lengths.pop(ESCAPE, 0)
+    for symbol in unseen:
+        code_lengths[symbol] = escape_length + 8
+
+    return canonical_codex(code_lengths)
+
+
+def save_codebook(codebook: Dict, codebook_id: int, directory: str = ".") -> str:
+    """ Saves a codebook from train_codebook under the given id.
+
+    :param codebook: dict containing the decoder ring for all 256 byte values
+    :param codebook_id: number that compressed messages use to refer to the codebook
+    :param directory: directory to save the codebook in
+    :returns: path of the saved codebook
+    """
+    path = os.path.join(directory, f"{codebook_id}.codebook")
+    with open(path, 'wb') as fp:
+        fp.write(CODEBOOK_HEADER.pack(CODEBOOK_MAGIC, CONTAINER_VERSION, codebook_id, ring_to_lengths(codebook)))
+    return path
+
+
+def load_codebook(codebook_id: int, directory: str = ".") -> Dict:
+    """ Loads a codebook saved by save_codebook.
+
+    :param codebook_id: id the codebook was saved under
+    :param directory: directory the codebook was saved in
+    :returns: dict containing the decoder ring for all 256 byte values
+    """
+    path = os.path.join(directory, f"{codebook_id}.codebook")
+    with open(path, 'rb') as fp:
+        magic, version, saved_id, code_lengths = CODEBOOK_HEADER.unpack(fp.read(CODEBOOK_HEADER.size))
+
+    if magic != CODEBOOK_MAGIC:
+        raise ValueError(f"{path} is not a codebook")
+    if version != CONTAINER_VERSION:
+        raise ValueError(f"{path} uses unsupported format version {version}")
+    if saved_id != codebook_id:
+        raise ValueError(f"{path} holds codebook {saved_id}, not {codebook_id}")
+
+    return lengths_to_ring(code_lengths)
+
+
+def compress_with_codebook(message: bytes, codebook: Dict, codebook_id: int) -> bytes:
+    """ Compresses a message against a shared codebook, storing only its id instead of a decoder ring.
+
+    :param message: raw sequence of bytes
+    :param codebook: dict containing the decoder ring for all 256 byte values
+    :param codebook_id: id the codebook was saved under
+    :returns: header followed by the packed codes
+    """
+    packed, message_padding = pack_bits(message, codebook)
+    return MESSAGE_HEADER.pack(codebook_id, message_padding) + packed
+
+
+def decompress_with_codebook(message: bytes, codebooks: Dict, tables: Dict = None) -> array:
+    """ Decompresses a message written by compress_with_codebook.
+
+    :param message: header followed by the packed codes
+    :param codebooks: dict mapping codebook ids to codebooks
+    :param tables: dict that caches a decoding table per codebook id, pass the
+    same one to every call so the tables are only built once
+    :returns: raw sequence of bytes that represent the decompressed message
+    """
+    codebook_id, message_padding = MESSAGE_HEADER.unpack_from(message)
+    codebook = codebooks[codebook_id]
+
+    if tables is None:
+        tables = {}
+    if codebook_id not in tables:
+        tables[codebook_id] = build_decode_table(codebook)
+
+    payload = memoryview(message)[MESSAGE_HEADER.size:]
+    return decode_bytes(payload, len(payload) * 8 - message_padding, codebook, tables[codebook_id])
 
 
 if __name__ == '__main__':
-    usage = f'Usage: {sys.argv[0]} [ -c | -d | -v | -w ] infile outfile'
+    usage = f'Usage: {sys.argv[0]} [ -c | -d | -v | -w | -sc | -sd | -pc | -pd ] infile outfile'
     if len(sys.argv) != 4:
         raise Exception(usage)
 
     operation = sys.argv[1]
-    if operation not in {'-c', '-d', '-v', '-w'}:
+    if operation not in {'-c', '-d', '-v', '-w', '-sc', '-sd', '-pc', '-pd'}:
         raise Exception(usage)
 
     infile, outfile = sys.argv[2], sys.argv[3]
     if not os.path.exists(infile):
         raise FileExistsError(f'{infile} does not exist.')
 
-    if operation in {'-c', '-v'}:
+    if operation in {'-sc', '-sd'}:
+        with open(infile, 'rb') as in_fp, open(outfile, 'wb') as out_fp:
+            if operation == '-sc':
+                compress_stream(in_fp, out_fp)
+            else:
+                decompress_stream(in_fp, out_fp)
+
+    elif operation == '-pc':
+        with open(infile, 'rb') as fp:
+            _message = fp.read()
+        _blocks, _decoder_ring = compress_parallel(_message)
+        with open(outfile, 'wb') as fp:
+            write_blocks(fp, _blocks, _decoder_ring)
+
+    elif operation == '-pd':
+        _blocks, _decoder_ring = read_blocks(infile)
+        bytes_message = decompress_parallel(_blocks, _decoder_ring)
+        with open(outfile, 'wb') as fp:
+            fp.write(bytes_message)
+
+    elif operation in {'-c', '-v'}:
         with open(infile, 'rb') as fp:
             _message = fp.read()
 
         if operation == '-c':
             _message, _decoder_ring = compress(_message)
             with open(outfile, 'wb') as fp:
-                marshal.dump((pickle.dumps(_decoder_ring), _message), fp)
+                write_compressed(fp, _message, _decoder_ring)
         else:
             _message, _decoder_ring = encode(_message)
             print(_message)
             with open(outfile, 'wb') as fp:
                 marshal.dump((pickle.dumps(_decoder_ring), _message), fp)
 
+    elif operation == '-d':
+        _message, _decoder_ring = read_compressed(infile)
+        bytes_message = decompress(_message, _decoder_ring)
+        with open(outfile, 'wb') as fp:
+            fp.write(bytes_message)
+
     else:
         with open(infile, 'rb') as fp:
             pickleRick, _message = marshal.load(fp)
             _decoder_ring = pickle.loads(pickleRick)
 
-        if operation == '-d':
-            bytes_message = decompress(array('B', _message), _decoder_ring)
-        else:
-            bytes_message = decode(_message, _decoder_ring)
+        bytes_message = decode(_message, _decoder_ring)
         with open(outfile, 'wb') as fp:
             fp.write(bytes_message)